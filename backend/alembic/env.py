@@ -13,7 +13,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.config import settings
 from app.db.base import Base
-from app.models import user, group, expense, payment, balance
+from app.models import user, group, expense, payment, balance, ledger, outbox
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,75 @@
+"""Add ledger event log and balance snapshots
+
+Revision ID: 3f8a6d2c5b47
+Revises: 7b4e2c9d1a35
+Create Date: 2026-10-18 19:41:26.508193
+
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a6d2c5b47'
+down_revision: Union[str, Sequence[str], None] = '7b4e2c9d1a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ledgerevent',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Enum('EXPENSE_POSTED', 'PAYMENT_CONFIRMED', 'SIMPLIFICATION_APPLIED', name='ledgereventkind'), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=True),
+    sa.Column('deltas', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['group.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ledgerevent_group_id', 'ledgerevent', ['group_id', 'id'], unique=False)
+    op.create_index('ix_ledgerevent_group_created', 'ledgerevent', ['group_id', 'created_at'], unique=False)
+
+    snapshots = op.create_table('balancesnapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('last_event_id', sa.Integer(), nullable=False),
+    sa.Column('as_of', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('pairs', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['group.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_balancesnapshot_group_event', 'balancesnapshot', ['group_id', 'last_event_id'], unique=False)
+    op.create_index('ix_balancesnapshot_group_as_of', 'balancesnapshot', ['group_id', 'as_of'], unique=False)
+
+    # Existing balances have no events behind them: record them as each group's
+    # baseline (last_event_id = 0), replay starts from there
+    pairs = defaultdict(list)
+    for row in op.get_bind().execute(sa.text(
+        "SELECT group_id, user_a_id, user_b_id, amount FROM pairbalance WHERE amount != 0 "
+        "ORDER BY group_id, user_a_id, user_b_id"
+    )):
+        pairs[row.group_id].append([row.user_a_id, row.user_b_id, str(row.amount)])
+    now = datetime.now(timezone.utc)
+    if pairs:
+        op.bulk_insert(snapshots, [
+            {"group_id": group_id, "last_event_id": 0, "as_of": now, "pairs": rows}
+            for group_id, rows in pairs.items()
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_balancesnapshot_group_as_of', table_name='balancesnapshot')
+    op.drop_index('ix_balancesnapshot_group_event', table_name='balancesnapshot')
+    op.drop_table('balancesnapshot')
+    op.drop_index('ix_ledgerevent_group_created', table_name='ledgerevent')
+    op.drop_index('ix_ledgerevent_group_id', table_name='ledgerevent')
+    op.drop_table('ledgerevent')
+    sa.Enum(name='ledgereventkind').drop(op.get_bind(), checkfirst=True)
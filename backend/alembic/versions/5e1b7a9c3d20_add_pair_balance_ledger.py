@@ -0,0 +1,85 @@
+"""Add canonical pair balance ledger
+
+Revision ID: 5e1b7a9c3d20
+Revises: 2c23c74f5be7
+Create Date: 2026-10-18 10:02:11.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1b7a9c3d20'
+down_revision: Union[str, Sequence[str], None] = '2c23c74f5be7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pairbalance',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_a_id', sa.Integer(), nullable=False),
+        sa.Column('user_b_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.CheckConstraint('user_a_id < user_b_id', name='ck_pairbalance_ordered'),
+        sa.ForeignKeyConstraint(['user_a_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['user_b_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pairbalance_id'), 'pairbalance', ['id'], unique=False)
+    op.create_index('ix_pairbalance_pair', 'pairbalance', ['user_a_id', 'user_b_id'], unique=True)
+
+    # Backfill: fold every directed edge (including duplicates) into one signed row per pair
+    op.execute(
+        """
+        INSERT INTO pairbalance (user_a_id, user_b_id, amount)
+        SELECT
+            CASE WHEN from_user_id < to_user_id THEN from_user_id ELSE to_user_id END,
+            CASE WHEN from_user_id < to_user_id THEN to_user_id ELSE from_user_id END,
+            SUM(CASE WHEN from_user_id < to_user_id THEN amount ELSE -amount END)
+        FROM balanceedge
+        WHERE from_user_id <> to_user_id
+        GROUP BY
+            CASE WHEN from_user_id < to_user_id THEN from_user_id ELSE to_user_id END,
+            CASE WHEN from_user_id < to_user_id THEN to_user_id ELSE from_user_id END
+        """
+    )
+
+    op.drop_index(op.f('ix_balanceedge_id'), table_name='balanceedge')
+    op.drop_table('balanceedge')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table(
+        'balanceedge',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('from_user_id', sa.Integer(), nullable=True),
+        sa.Column('to_user_id', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['from_user_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['to_user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_balanceedge_id'), 'balanceedge', ['id'], unique=False)
+
+    op.execute(
+        """
+        INSERT INTO balanceedge (from_user_id, to_user_id, amount)
+        SELECT
+            CASE WHEN amount > 0 THEN user_a_id ELSE user_b_id END,
+            CASE WHEN amount > 0 THEN user_b_id ELSE user_a_id END,
+            ABS(amount)
+        FROM pairbalance
+        WHERE amount <> 0
+        """
+    )
+
+    op.drop_index('ix_pairbalance_pair', table_name='pairbalance')
+    op.drop_index(op.f('ix_pairbalance_id'), table_name='pairbalance')
+    op.drop_table('pairbalance')
@@ -0,0 +1,45 @@
+"""Add created_at to Expense and Group, keyset pagination indexes
+
+Revision ID: 7b4e2c9d1a35
+Revises: f5c03e1d6a94
+Create Date: 2026-10-18 18:02:11.417356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b4e2c9d1a35'
+down_revision: Union[str, Sequence[str], None] = 'f5c03e1d6a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows get the migration time, ordering among them falls back to id
+    with op.batch_alter_table('expense') as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+        batch_op.create_index('ix_expense_group_created', ['group_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('group') as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+
+    op.create_index('ix_payment_from_created', 'payment', ['from_user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_payment_to_created', 'payment', ['to_user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payment_to_created', table_name='payment')
+    op.drop_index('ix_payment_from_created', table_name='payment')
+
+    with op.batch_alter_table('group') as batch_op:
+        batch_op.drop_column('created_at')
+
+    with op.batch_alter_table('expense') as batch_op:
+        batch_op.drop_index('ix_expense_group_created')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,52 @@
+"""Add per-user net balance
+
+Revision ID: a43f0d2e8b61
+Revises: 5e1b7a9c3d20
+Create Date: 2026-10-18 11:26:45.103257
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a43f0d2e8b61'
+down_revision: Union[str, Sequence[str], None] = '5e1b7a9c3d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'usernetbalance',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('dirty', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_usernetbalance_dirty'), 'usernetbalance', ['dirty'], unique=False)
+
+    # Backfill from the pair ledger. Everyone starts dirty, so the first
+    # incremental run simplifies the whole existing graph once.
+    op.execute(
+        """
+        INSERT INTO usernetbalance (user_id, amount, dirty)
+        SELECT user_id, SUM(amount), true
+        FROM (
+            SELECT user_a_id AS user_id, -amount AS amount FROM pairbalance
+            UNION ALL
+            SELECT user_b_id AS user_id, amount FROM pairbalance
+        ) AS sides
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_usernetbalance_dirty'), table_name='usernetbalance')
+    op.drop_table('usernetbalance')
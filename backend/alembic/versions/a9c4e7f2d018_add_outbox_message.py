@@ -0,0 +1,45 @@
+"""Add transactional outbox
+
+Revision ID: a9c4e7f2d018
+Revises: 3f8a6d2c5b47
+Create Date: 2026-10-18 20:27:53.114620
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e7f2d018'
+down_revision: Union[str, Sequence[str], None] = '3f8a6d2c5b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outboxmessage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('dispatched_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outboxmessage_topic_key', 'outboxmessage', ['topic', 'key'], unique=True)
+    op.create_index(
+        'ix_outboxmessage_pending', 'outboxmessage', ['id'], unique=False,
+        postgresql_where=sa.text('dispatched_at IS NULL'), sqlite_where=sa.text('dispatched_at IS NULL'),
+    )
+    op.create_index('ix_outboxmessage_dispatched_at', 'outboxmessage', ['dispatched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outboxmessage_dispatched_at', table_name='outboxmessage')
+    op.drop_index('ix_outboxmessage_pending', table_name='outboxmessage')
+    op.drop_index('ix_outboxmessage_topic_key', table_name='outboxmessage')
+    op.drop_table('outboxmessage')
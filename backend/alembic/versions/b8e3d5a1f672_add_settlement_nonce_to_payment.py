@@ -0,0 +1,32 @@
+"""Add settlement nonce and gas price to Payment
+
+Revision ID: b8e3d5a1f672
+Revises: e6a1c3f9b274
+Create Date: 2026-10-18 23:05:12.418630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3d5a1f672'
+down_revision: Union[str, Sequence[str], None] = 'e6a1c3f9b274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('payment', sa.Column('settlement_nonce', sa.BigInteger(), nullable=True))
+    op.add_column('payment', sa.Column('settlement_gas_price', sa.BigInteger(), nullable=True))
+    op.add_column('payment', sa.Column('settlement_replaced_tx_hashes', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('payment', 'settlement_replaced_tx_hashes')
+    op.drop_column('payment', 'settlement_gas_price')
+    op.drop_column('payment', 'settlement_nonce')
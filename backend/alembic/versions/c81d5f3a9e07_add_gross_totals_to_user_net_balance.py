@@ -0,0 +1,53 @@
+"""Add gross totals to user net balance
+
+Revision ID: c81d5f3a9e07
+Revises: a43f0d2e8b61
+Create Date: 2026-10-18 12:48:03.771520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d5f3a9e07'
+down_revision: Union[str, Sequence[str], None] = 'a43f0d2e8b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('usernetbalance', sa.Column('owes', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+    op.add_column('usernetbalance', sa.Column('owed', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+
+    op.execute(
+        """
+        UPDATE usernetbalance
+        SET owes = totals.owes, owed = totals.owed
+        FROM (
+            SELECT user_id, SUM(owes) AS owes, SUM(owed) AS owed
+            FROM (
+                SELECT user_a_id AS user_id,
+                       CASE WHEN amount > 0 THEN amount ELSE 0 END AS owes,
+                       CASE WHEN amount < 0 THEN -amount ELSE 0 END AS owed
+                FROM pairbalance
+                UNION ALL
+                SELECT user_b_id AS user_id,
+                       CASE WHEN amount < 0 THEN -amount ELSE 0 END AS owes,
+                       CASE WHEN amount > 0 THEN amount ELSE 0 END AS owed
+                FROM pairbalance
+            ) AS sides
+            GROUP BY user_id
+        ) AS totals
+        WHERE usernetbalance.user_id = totals.user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('usernetbalance', 'owed')
+    op.drop_column('usernetbalance', 'owes')
@@ -0,0 +1,30 @@
+"""Add version counter to Group
+
+Revision ID: d2b7f4a8c631
+Revises: a9c4e7f2d018
+Create Date: 2026-10-18 21:12:40.662875
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b7f4a8c631'
+down_revision: Union[str, Sequence[str], None] = 'a9c4e7f2d018'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('group') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('group') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,159 @@
+"""Scope balances to groups
+
+Revision ID: e2a96c4b7f18
+Revises: c81d5f3a9e07
+Create Date: 2026-10-18 14:05:37.219864
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a96c4b7f18'
+down_revision: Union[str, Sequence[str], None] = 'c81d5f3a9e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _positions_from_pairs(grouped: bool) -> str:
+    """Net and gross totals per user (and group) derived from pairbalance."""
+    keys = "group_id, user_id" if grouped else "user_id"
+    group_col = "group_id, " if grouped else ""
+    return f"""
+        SELECT {keys}, SUM(amount), SUM(owes), SUM(owed), true
+        FROM (
+            SELECT {group_col}user_a_id AS user_id, -amount AS amount,
+                   CASE WHEN amount > 0 THEN amount ELSE 0 END AS owes,
+                   CASE WHEN amount < 0 THEN -amount ELSE 0 END AS owed
+            FROM pairbalance
+            UNION ALL
+            SELECT {group_col}user_b_id AS user_id, amount,
+                   CASE WHEN amount < 0 THEN -amount ELSE 0 END AS owes,
+                   CASE WHEN amount > 0 THEN amount ELSE 0 END AS owed
+            FROM pairbalance
+        ) AS sides
+        GROUP BY {keys}
+    """
+
+
+def _create_usernetbalance(grouped: bool) -> None:
+    columns = []
+    if grouped:
+        columns.append(sa.Column('group_id', sa.Integer(), nullable=False))
+    columns += [
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('owes', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False),
+        sa.Column('owed', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False),
+        sa.Column('dirty', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    ]
+    if grouped:
+        columns += [
+            sa.ForeignKeyConstraint(['group_id'], ['group.id'], ),
+            sa.PrimaryKeyConstraint('group_id', 'user_id'),
+        ]
+    else:
+        columns.append(sa.PrimaryKeyConstraint('user_id'))
+    op.create_table('usernetbalance', *columns)
+    op.create_index(op.f('ix_usernetbalance_dirty'), 'usernetbalance', ['dirty'], unique=False)
+    if grouped:
+        op.create_index(op.f('ix_usernetbalance_user_id'), 'usernetbalance', ['user_id'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('payment') as batch_op:
+        batch_op.add_column(sa.Column('group_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_payment_group_id'), ['group_id'], unique=False)
+        batch_op.create_foreign_key('fk_payment_group_id_group', 'group', ['group_id'], ['id'])
+
+    # Attribute existing payments to the first group both users share
+    op.execute(
+        """
+        UPDATE payment SET group_id = (
+            SELECT MIN(a.group_id)
+            FROM group_members AS a
+            JOIN group_members AS b ON a.group_id = b.group_id
+            WHERE a.user_id = payment.from_user_id AND b.user_id = payment.to_user_id
+        )
+        """
+    )
+
+    # The global ledger cannot be split by group, so it is rebuilt from history
+    op.execute("DELETE FROM pairbalance")
+    with op.batch_alter_table('pairbalance') as batch_op:
+        batch_op.add_column(sa.Column('group_id', sa.Integer(), nullable=False))
+        batch_op.create_foreign_key('fk_pairbalance_group_id_group', 'group', ['group_id'], ['id'])
+        batch_op.drop_index('ix_pairbalance_pair')
+        batch_op.create_index('ix_pairbalance_group_pair', ['group_id', 'user_a_id', 'user_b_id'], unique=True)
+
+    op.execute(
+        """
+        INSERT INTO pairbalance (group_id, user_a_id, user_b_id, amount)
+        SELECT group_id, user_a_id, user_b_id, SUM(amount)
+        FROM (
+            SELECT e.group_id,
+                   CASE WHEN s.user_id < e.paid_by_id THEN s.user_id ELSE e.paid_by_id END AS user_a_id,
+                   CASE WHEN s.user_id < e.paid_by_id THEN e.paid_by_id ELSE s.user_id END AS user_b_id,
+                   CASE WHEN s.user_id < e.paid_by_id THEN s.amount ELSE -s.amount END AS amount
+            FROM expensesplit AS s
+            JOIN expense AS e ON e.id = s.expense_id
+            WHERE e.group_id IS NOT NULL AND s.user_id <> e.paid_by_id
+            UNION ALL
+            SELECT p.group_id,
+                   CASE WHEN p.from_user_id < p.to_user_id THEN p.from_user_id ELSE p.to_user_id END,
+                   CASE WHEN p.from_user_id < p.to_user_id THEN p.to_user_id ELSE p.from_user_id END,
+                   CASE WHEN p.from_user_id < p.to_user_id THEN -p.amount ELSE p.amount END
+            FROM payment AS p
+            WHERE p.status = 'CONFIRMED' AND p.group_id IS NOT NULL AND p.from_user_id <> p.to_user_id
+        ) AS history
+        GROUP BY group_id, user_a_id, user_b_id
+        """
+    )
+
+    op.drop_index(op.f('ix_usernetbalance_dirty'), table_name='usernetbalance')
+    op.drop_table('usernetbalance')
+    _create_usernetbalance(grouped=True)
+    op.execute(
+        "INSERT INTO usernetbalance (group_id, user_id, amount, owes, owed, dirty) "
+        + _positions_from_pairs(grouped=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    totals = bind.execute(sa.text(
+        "SELECT user_a_id, user_b_id, SUM(amount) FROM pairbalance GROUP BY user_a_id, user_b_id"
+    )).fetchall()
+
+    op.execute("DELETE FROM pairbalance")
+    with op.batch_alter_table('pairbalance') as batch_op:
+        batch_op.drop_index('ix_pairbalance_group_pair')
+        batch_op.drop_constraint('fk_pairbalance_group_id_group', type_='foreignkey')
+        batch_op.drop_column('group_id')
+        batch_op.create_index('ix_pairbalance_pair', ['user_a_id', 'user_b_id'], unique=True)
+
+    if totals:
+        bind.execute(
+            sa.text("INSERT INTO pairbalance (user_a_id, user_b_id, amount) VALUES (:a, :b, :amount)"),
+            [{"a": a, "b": b, "amount": amount} for a, b, amount in totals],
+        )
+
+    op.drop_index(op.f('ix_usernetbalance_user_id'), table_name='usernetbalance')
+    op.drop_index(op.f('ix_usernetbalance_dirty'), table_name='usernetbalance')
+    op.drop_table('usernetbalance')
+    _create_usernetbalance(grouped=False)
+    op.execute(
+        "INSERT INTO usernetbalance (user_id, amount, owes, owed, dirty) "
+        + _positions_from_pairs(grouped=False)
+    )
+
+    with op.batch_alter_table('payment') as batch_op:
+        batch_op.drop_constraint('fk_payment_group_id_group', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_payment_group_id'))
+        batch_op.drop_column('group_id')
@@ -0,0 +1,84 @@
+"""Store money as integer cents
+
+Revision ID: e6a1c3f9b274
+Revises: d2b7f4a8c631
+Create Date: 2026-10-18 22:04:18.930417
+
+"""
+import json
+from decimal import Decimal
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a1c3f9b274'
+down_revision: Union[str, Sequence[str], None] = 'd2b7f4a8c631'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> Numeric(10, 2) columns, each replaced by a BIGINT <column>_cents
+MONEY_COLUMNS = {
+    'expense': ['amount'],
+    'expensesplit': ['amount'],
+    'payment': ['amount'],
+    'pairbalance': ['amount'],
+    'usernetbalance': ['amount', 'owes', 'owed'],
+}
+
+# table -> JSON column of [user_a_id, user_b_id, amount] rows
+LEDGER_JSON = {
+    'ledgerevent': 'deltas',
+    'balancesnapshot': 'pairs',
+}
+
+
+def _convert_ledger_json(to_cents: bool) -> None:
+    bind = op.get_bind()
+    for table, column in LEDGER_JSON.items():
+        for row in bind.execute(sa.text(f"SELECT id, {column} FROM {table}")).all():
+            rows = row[1] if isinstance(row[1], list) else json.loads(row[1])
+            if to_cents:
+                converted = [[a, b, int(Decimal(amount) * 100)] for a, b, amount in rows]
+            else:
+                converted = [[a, b, str(Decimal(amount).scaleb(-2))] for a, b, amount in rows]
+            bind.execute(
+                sa.text(f"UPDATE {table} SET {column} = :value WHERE id = :id"),
+                {"value": json.dumps(converted), "id": row[0]},
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.add_column(sa.Column(f'{column}_cents', sa.BigInteger(), server_default='0', nullable=False))
+        op.execute(f"UPDATE {table} SET " + ", ".join(
+            f"{column}_cents = CAST(ROUND({column} * 100) AS BIGINT)" for column in columns
+        ))
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(f'{column}_cents', server_default=None)
+                batch_op.drop_column(column)
+
+    _convert_ledger_json(to_cents=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _convert_ledger_json(to_cents=False)
+
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.add_column(sa.Column(column, sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+        op.execute(f"UPDATE {table} SET " + ", ".join(
+            f"{column} = {column}_cents / 100.0" for column in columns
+        ))
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, server_default=None)
+                batch_op.drop_column(f'{column}_cents')
@@ -0,0 +1,40 @@
+"""Add settlement tracking to Payment
+
+Revision ID: f5c03e1d6a94
+Revises: e2a96c4b7f18
+Create Date: 2026-10-18 16:21:50.634102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c03e1d6a94'
+down_revision: Union[str, Sequence[str], None] = 'e2a96c4b7f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+settlement_status = sa.Enum('SUBMITTED', 'CONFIRMED', 'FAILED', name='settlementstatus')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    settlement_status.create(op.get_bind(), checkfirst=True)
+    op.add_column('payment', sa.Column('settlement_status', settlement_status, nullable=True))
+    op.add_column('payment', sa.Column('settlement_tx_hash', sa.String(), nullable=True))
+    op.add_column('payment', sa.Column('settlement_submitted_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_payment_settlement_status'), 'payment', ['settlement_status'], unique=False)
+    op.create_index(op.f('ix_payment_settlement_tx_hash'), 'payment', ['settlement_tx_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_payment_settlement_tx_hash'), table_name='payment')
+    op.drop_index(op.f('ix_payment_settlement_status'), table_name='payment')
+    op.drop_column('payment', 'settlement_submitted_at')
+    op.drop_column('payment', 'settlement_tx_hash')
+    op.drop_column('payment', 'settlement_status')
+    settlement_status.drop(op.get_bind(), checkfirst=True)
@@ -1,37 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.schemas.expense import ExpenseCreate, ExpenseResponse
-from app.models.expense import Expense, ExpenseSplit
-from app.services.reconciliation import reconcile_expense
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.expense import ExpenseCreate, ExpenseResponse, ExpenseImportResponse
+from app.services.expenses import ExpenseRejected, create_expense
+from app.services.expense_import import ImportAborted, import_expenses, parse_rows
 from app.api.deps import get_current_user, get_db
 
 router = APIRouter()
 
 @router.post("/", response_model=ExpenseResponse)
-def create_new_expense(expense_in: ExpenseCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    # Create Expense
-    expense = Expense(
-        group_id=expense_in.group_id,
-        paid_by_id=expense_in.paid_by_id,
-        amount=expense_in.amount
-    )
-    db.add(expense)
-    db.flush() # Get ID
-    
-    # Create Splits
-    for split_in in expense_in.splits:
-        split = ExpenseSplit(
-            expense_id=expense.id,
-            user_id=split_in.user_id,
-            amount=split_in.amount
-        )
-        db.add(split)
-    
-    db.commit()
-    db.refresh(expense)
-    
-    # Reconcile balances immediately (Expenses create debts)
-    reconcile_expense(db, expense)
-    db.commit()
-    
-    return expense
+async def create_new_expense(expense_in: ExpenseCreate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    try:
+        return await create_expense(db, expense_in, current_user.id)
+    except ExpenseRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/import", response_model=ExpenseImportResponse)
+async def import_expense_file(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults from Content-Type"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    # The body is read as a stream, large files are never held in memory
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        report = await import_expenses(db, current_user.id, parse_rows(request.stream(), format))
+    except ImportAborted as e:
+        # Earlier chunks stay committed, say how many rows that was
+        raise HTTPException(status_code=400, detail={"error": str(e), "imported": e.report.imported})
+    return report
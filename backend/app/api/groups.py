@@ -1,88 +1,182 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from app.schemas.group import GroupCreate, GroupResponse, GroupDetailResponse, AddMemberRequest, BalanceResponse
-from app.models.group import Group
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from app.schemas.group import GroupCreate, GroupResponse, GroupDetailResponse, AddMemberRequest, BalanceResponse, ExpenseResponse
+from app.schemas.pagination import Page
+from app.models.group import Group, group_members
 from app.models.user import User
-from app.models.balance import BalanceEdge
-from app.api.deps import get_current_user, get_db
+from app.models.balance import PairBalance
+from app.services.expenses import list_group_expenses
+from app.services.groups import bump_group_versions, get_group_version
+from app.services.ledger import LedgerHistoryUnavailable, group_pairs_at
+from app.core.group_cache import group_cache
+from app.core.money import from_cents
+from app.core.membership_cache import membership_cache
+from app.db.pagination import keyset, page
+from app.db.upsert import dialect_insert
+from app.api.deps import PageParams, get_as_of, get_current_user, get_db, get_page_params, require_group_member
 
 router = APIRouter()
 
+# Expenses embedded in the group detail, older ones are paginated
+GROUP_DETAIL_EXPENSES = 20
+
+BALANCES_ADAPTER = TypeAdapter(List[BalanceResponse])
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
+
+async def _versioned_response(
+    request: Request, db: AsyncSession, kind: str, group_id: int, build: Callable[[], Awaitable[bytes]]
+) -> Response:
+    """
+    Serves a group response by version: 304 when the client already has it,
+    else the cached body for this version, else a freshly built one.
+    The version is read before the body is built, so a concurrent write can
+    only make the cached body newer than its tag, never older.
+    """
+    version = await get_group_version(db, group_id)
+    # Clients revalidate on every use, unchanged groups cost one lookup
+    headers = {"ETag": f'"{group_id}-{version}"', "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    body = group_cache.get(kind, group_id, version)
+    if body is None:
+        body = await build()
+        group_cache.set(kind, group_id, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _load_group(db: AsyncSession, group_id: int) -> Group:
+    # Membership was checked by require_group_member, the group exists
+    result = await db.execute(select(Group).where(Group.id == group_id).options(selectinload(Group.members)))
+    return result.scalars().one()
+
+async def _group_detail(db: AsyncSession, group: Group) -> dict:
+    # Async sessions cannot lazy-load, so the members must already be loaded.
+    # The recent expenses add two statements, whatever the group's history.
+    expenses = await list_group_expenses(db, group.id, None, GROUP_DETAIL_EXPENSES)
+    return {
+        "id": group.id,
+        "name": group.name,
+        "created_at": group.created_at,
+        "members": group.members,
+        "expenses": expenses["items"],
+        "expenses_next_cursor": expenses["next_cursor"],
+    }
+
 @router.get("/{group_id}/balances", response_model=List[BalanceResponse])
-def get_group_balances(group_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    
-    if current_user not in group.members:
-        raise HTTPException(status_code=403, detail="Not a member of this group")
-    
-    member_ids = [m.id for m in group.members]
-    
-    # Find balances where both users are in the group
-    balances = db.query(BalanceEdge).filter(
-        BalanceEdge.from_user_id.in_(member_ids),
-        BalanceEdge.to_user_id.in_(member_ids),
-        BalanceEdge.amount > 0
-    ).all()
+async def get_group_balances(
+    request: Request,
+    group_id: int = Depends(require_group_member),
+    at: Optional[datetime] = Depends(get_as_of),
+    db: AsyncSession = Depends(get_db),
+):
+    if at is not None:
+        return await _group_balances_at(db, group_id, at)
+    return await _versioned_response(request, db, "balances", group_id, lambda: _group_balances(db, group_id))
+
+async def _group_balances(db: AsyncSession, group_id: int) -> bytes:
+    # Balances are scoped to the group, served by the (group_id, user_a_id, user_b_id) index.
+    # Both users are joined in, so the whole list is one statement.
+    result = await db.execute(
+        select(PairBalance).where(
+            PairBalance.group_id == group_id,
+            PairBalance.amount_cents != 0
+        ).options(joinedload(PairBalance.user_a), joinedload(PairBalance.user_b))
+    )
+    balances = result.scalars().all()
     
-    return balances
+    # Orient each pair as debtor -> creditor with a positive amount
+    return BALANCES_ADAPTER.dump_json([
+        BalanceResponse(from_user=b.from_user, to_user=b.to_user, amount=from_cents(abs(b.amount_cents)))
+        for b in balances
+    ])
+
+async def _group_balances_at(db: AsyncSession, group_id: int, at: datetime) -> List[BalanceResponse]:
+    try:
+        pairs = await db.run_sync(group_pairs_at, group_id, at)
+    except LedgerHistoryUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user_ids = {user_id for pair in pairs for user_id in pair}
+    users = {}
+    if user_ids:
+        result = await db.execute(select(User).where(User.id.in_(user_ids)))
+        users = {user.id: user for user in result.scalars()}
+
+    # Same orientation as the live balances: debtor -> creditor
+    return [
+        BalanceResponse(
+            from_user=users[user_a] if amount > 0 else users[user_b],
+            to_user=users[user_b] if amount > 0 else users[user_a],
+            amount=from_cents(abs(amount)),
+        )
+        for (user_a, user_b), amount in pairs.items()
+    ]
 
 @router.post("/{group_id}/members", response_model=GroupDetailResponse)
-def add_member(group_id: int, request: AddMemberRequest, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    
-    if current_user not in group.members:
-        raise HTTPException(status_code=403, detail="Not a member of this group")
-        
-    user_to_add = db.query(User).filter(User.email == request.email).first()
+async def add_member(request: AddMemberRequest, group_id: int = Depends(require_group_member), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).where(User.email == request.email))
+    user_to_add = result.scalars().first()
     if not user_to_add:
         raise HTTPException(status_code=404, detail="User with this email not found")
-        
-    if user_to_add in group.members:
+    
+    # The insert itself decides, so two concurrent adds of the same user
+    # cannot both pass a membership check and then collide on the key
+    added = await db.execute(
+        dialect_insert(db, group_members).values(user_id=user_to_add.id, group_id=group_id)
+        .on_conflict_do_nothing(index_elements=[group_members.c.user_id, group_members.c.group_id])
+    )
+    if added.rowcount != 1:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="User already in group")
-        
-    group.members.append(user_to_add)
-    db.commit()
-    db.refresh(group)
-    return group
+    await db.execute(bump_group_versions([group_id]))
+    await db.commit()
+    membership_cache.add(user_to_add.id, group_id)
+    return await _group_detail(db, await _load_group(db, group_id))
 
 @router.get("/{group_id}", response_model=GroupDetailResponse)
-def read_group(group_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    group = db.query(Group).filter(Group.id == group_id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-    
-    # Check if user is a member
-    if current_user not in group.members:
-        raise HTTPException(status_code=403, detail="Not a member of this group")
-        
-    return group
+async def read_group(request: Request, group_id: int = Depends(require_group_member), db: AsyncSession = Depends(get_db)):
+    async def build() -> bytes:
+        detail = await _group_detail(db, await _load_group(db, group_id))
+        return GroupDetailResponse.model_validate(detail).model_dump_json().encode()
+    return await _versioned_response(request, db, "detail", group_id, build)
+
+@router.get("/{group_id}/expenses", response_model=Page[ExpenseResponse])
+async def read_group_expenses(group_id: int = Depends(require_group_member), params: PageParams = Depends(get_page_params), db: AsyncSession = Depends(get_db)):
+    return await list_group_expenses(db, group_id, params.cursor, params.limit)
 
-@router.get("/", response_model=List[GroupResponse])
-def read_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    # Return groups where the current user is a member
-    return current_user.groups
+@router.get("/", response_model=Page[GroupResponse])
+async def read_groups(params: PageParams = Depends(get_page_params), db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    # Return groups where the current user is a member, starting from the
+    # user's rows in the group_members primary key
+    stmt = select(Group).join(group_members, group_members.c.group_id == Group.id).where(
+        group_members.c.user_id == current_user.id
+    )
+    result = await db.execute(keyset(stmt, Group.created_at, Group.id, params.cursor, params.limit))
+    return page(result.scalars().all(), params.limit)
 
 @router.post("/", response_model=GroupResponse)
-def create_group(group_in: GroupCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def create_group(group_in: GroupCreate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     group = Group(name=group_in.name)
     
     # Add creator as member
     group.members.append(current_user)
     
-    # Add other members
-    for user_id in group_in.member_ids:
-        # Avoid adding creator twice
-        if user_id != current_user.id:
-            user = db.query(User).filter(User.id == user_id).first()
-            if user:
-                group.members.append(user)
+    # Add other members, avoiding adding the creator twice
+    member_ids = {user_id for user_id in group_in.member_ids if user_id != current_user.id}
+    if member_ids:
+        result = await db.execute(select(User).where(User.id.in_(member_ids)))
+        group.members.extend(result.scalars().all())
             
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    await db.commit()
+    await db.refresh(group)
     return group
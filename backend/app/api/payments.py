@@ -1,18 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.pagination import Page
 from app.schemas.payment import PaymentCreate, PaymentResponse
-from app.services.payments import create_payment, confirm_payment
-from app.api.deps import get_current_user, get_db
+from app.services.payments import PaymentRejected, create_payment, confirm_payment, list_user_payments
+from app.api.deps import PageParams, get_current_user, get_db, get_page_params
 
 router = APIRouter()
 
+@router.get("/", response_model=Page[PaymentResponse])
+async def read_payments(params: PageParams = Depends(get_page_params), db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    # Payments the current user sent or received
+    return await list_user_payments(db, current_user.id, params.cursor, params.limit)
+
 @router.post("/", response_model=PaymentResponse)
-def create_new_payment(payment: PaymentCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    return create_payment(db, payment)
+async def create_new_payment(payment: PaymentCreate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    try:
+        return await create_payment(db, payment)
+    except PaymentRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/{payment_id}/confirm", response_model=PaymentResponse)
-def confirm_existing_payment(payment_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    payment = confirm_payment(db, payment_id)
+async def confirm_existing_payment(payment_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    try:
+        payment = await confirm_payment(db, payment_id)
+    except PaymentRejected as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     return payment
@@ -1,36 +1,62 @@
+from datetime import datetime
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.user import UserCreate, UserResponse, UserUpdate, UserBalanceResponse
 from app.models.user import User
-from app.api.deps import get_db, get_supabase_user
+from app.services.balances import get_user_position
+from app.services.ledger import LedgerHistoryUnavailable, user_position_at
+from app.api import deps
+from app.api.deps import get_as_of, get_db, get_supabase_user
+from app.core.identity_cache import identity_cache, resolve_user
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user(db: Session = Depends(get_db), supabase_user = Depends(get_supabase_user)):
-    user = db.query(User).filter(User.supabase_id == supabase_user.id).first()
+async def get_current_user(db: AsyncSession = Depends(get_db), supabase_user = Depends(get_supabase_user)):
+    user = await resolve_user(db, supabase_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+@router.get("/me/balance", response_model=UserBalanceResponse)
+async def get_my_balance(
+    at: Optional[datetime] = Depends(get_as_of),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    if at is not None:
+        try:
+            position = await db.run_sync(user_position_at, current_user.id, at)
+        except LedgerHistoryUnavailable as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return UserBalanceResponse.from_cents(position)
+
+    # Materialized totals, one indexed lookup over the user's groups
+    position = await db.run_sync(get_user_position, current_user.id)
+    return UserBalanceResponse.from_cents(position)
+
 @router.put("/me", response_model=UserResponse)
-def update_user(user_in: UserUpdate, db: Session = Depends(get_db), supabase_user = Depends(get_supabase_user)):
-    user = db.query(User).filter(User.supabase_id == supabase_user.id).first()
+async def update_user(user_in: UserUpdate, db: AsyncSession = Depends(get_db), supabase_user = Depends(get_supabase_user)):
+    user = await resolve_user(db, supabase_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if user_in.wallet_address is not None:
         user.wallet_address = user_in.wallet_address
         
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    identity_cache.invalidate(supabase_user.id)
+    await db.refresh(user)
+    identity_cache.set(user)
     return user
 
 @router.post("/", response_model=UserResponse)
-def create_user(user_in: UserCreate, db: Session = Depends(get_db), supabase_user = Depends(get_supabase_user)):
+async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db), supabase_user = Depends(get_supabase_user)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.supabase_id == supabase_user.id).first()
-    if existing_user:
+    result = await db.execute(select(User).where(User.supabase_id == supabase_user.id))
+    if result.scalars().first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User already registered",
@@ -43,6 +69,8 @@ def create_user(user_in: UserCreate, db: Session = Depends(get_db), supabase_use
         email=supabase_user.email
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    identity_cache.invalidate(supabase_user.id)
+    await db.refresh(user)
+    identity_cache.set(user)
     return user
@@ -7,7 +7,7 @@ broker_use_ssl = None
 if settings.REDIS_URL.startswith("rediss://"):
     broker_use_ssl = {"ssl_cert_reqs": ssl.CERT_NONE}
 
-celery_app = Celery("worker", broker=settings.REDIS_URL)
+celery_app = Celery("worker", broker=settings.REDIS_URL, include=["app.workers.settlement_writer", "app.workers.ledger_snapshots", "app.workers.outbox_relay"])
 
 celery_app.conf.update(
     task_serializer="json",
@@ -17,3 +17,29 @@ celery_app.conf.update(
     enable_utc=True,
     broker_use_ssl=broker_use_ssl,
 )
+
+# Task runtime metrics, its signal handlers must be connected before the worker starts
+from app.workers import task_metrics # noqa: F401
+
+celery_app.conf.beat_schedule = {
+    # Publish committed outbox messages (confirmed payments) to the settlement queue
+    "relay-outbox": {
+        "task": "app.workers.outbox_relay.relay_outbox",
+        "schedule": float(settings.OUTBOX_RELAY_INTERVAL),
+    },
+    # Flush partially filled settlement batches at the end of every window
+    "flush-settlement-batch": {
+        "task": "app.workers.settlement_writer.flush_settlement_batch",
+        "schedule": float(settings.SETTLEMENT_BATCH_WINDOW),
+    },
+    # Confirm submitted settlement transactions without blocking a worker on them
+    "poll-settlement-receipts": {
+        "task": "app.workers.settlement_writer.poll_settlement_receipts",
+        "schedule": float(settings.SETTLEMENT_RECEIPT_POLL_INTERVAL),
+    },
+    # Bound the events a balance rebuild or point-in-time query has to replay
+    "snapshot-ledgers": {
+        "task": "app.workers.ledger_snapshots.snapshot_ledgers",
+        "schedule": float(settings.LEDGER_SNAPSHOT_INTERVAL),
+    },
+}
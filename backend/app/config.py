@@ -11,6 +11,23 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "password"
     POSTGRES_DB: str = "settlemint"
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    # Used by the async request path, derived from SQLALCHEMY_DATABASE_URI when unset
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None
+    # Create missing tables at startup, for empty development databases only.
+    # The schema is otherwise managed with `alembic upgrade head`.
+    DB_CREATE_ALL: bool = False
+    # Connection pool, applied to each engine in every process (API replica or worker).
+    # "queue": in-process pool, "null": no pool, for transaction-pooled PgBouncer.
+    DB_POOL_MODE: str = "queue"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800 # seconds, -1 to keep connections forever
+    # "always": ping on every checkout, "idle": only after DB_POOL_PRE_PING_IDLE seconds unused, "never"
+    DB_POOL_PRE_PING: str = "idle"
+    DB_POOL_PRE_PING_IDLE: int = 30
+    # asyncpg prepared statement caches, must be 0 behind PgBouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
 
     # Redis settings
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -19,10 +36,58 @@ class Settings(BaseSettings):
     ETHEREUM_NODE_URL: str = "http://localhost:8545"
     SETTLEMENT_CONTRACT_ADDRESS: Optional[str] = None
     PRIVATE_KEY: Optional[str] = None
+    CHAIN_ID: int = 1337 # Localhost / Ganache
+    ETHEREUM_POOL_SIZE: int = 10
+    GAS_PRICE_TTL: int = 15
+    ETHEREUM_HEALTH_CHECK_INTERVAL: int = 30
+    # Confirmed payments are buffered and written on-chain in one transaction
+    # once SETTLEMENT_BATCH_SIZE is reached or every SETTLEMENT_BATCH_WINDOW seconds.
+    SETTLEMENT_BATCH_SIZE: int = 50
+    SETTLEMENT_BATCH_WINDOW: int = 30
+    # "batch": recordSettlements with every settlement, "merkle": recordSettlementRoot only
+    SETTLEMENT_BATCH_MODE: str = "batch"
+    # Submitted transactions are checked for receipts every SETTLEMENT_RECEIPT_POLL_INTERVAL
+    # seconds and replaced with a higher gas price if still unmined after
+    # SETTLEMENT_RECEIPT_TIMEOUT seconds.
+    SETTLEMENT_RECEIPT_POLL_INTERVAL: int = 15
+    SETTLEMENT_RECEIPT_TIMEOUT: int = 600
+    # Confirmed payments reach the settlement queue through the outbox, relayed
+    # every OUTBOX_RELAY_INTERVAL seconds in batches of OUTBOX_RELAY_BATCH_SIZE.
+    # Dispatched messages are kept for OUTBOX_RETENTION seconds.
+    OUTBOX_RELAY_INTERVAL: int = 2
+    OUTBOX_RELAY_BATCH_SIZE: int = 500
+    OUTBOX_RETENTION: int = 86400
+    # Ledger events are folded into per-group balance snapshots every
+    # LEDGER_SNAPSHOT_INTERVAL seconds.
+    LEDGER_SNAPSHOT_INTERVAL: int = 3600
 
     # Supabase settings
     SUPABASE_URL: Optional[str] = None
     SUPABASE_KEY: Optional[str] = None
+    # Local access token verification. HS256 tokens need the project's JWT secret,
+    # asymmetric tokens use the JWKS (defaults to {SUPABASE_URL}/auth/v1/.well-known/jwks.json).
+    SUPABASE_JWT_SECRET: Optional[str] = None
+    SUPABASE_JWKS_URL: Optional[str] = None
+    SUPABASE_JWT_AUDIENCE: Optional[str] = "authenticated"
+    JWKS_CACHE_TTL: int = 600
+    JWT_LEEWAY: int = 0
+    # Ask the Supabase auth server when a token cannot be verified locally
+    AUTH_REMOTE_FALLBACK: bool = True
+    # supabase_id -> User cache used by get_current_user
+    IDENTITY_CACHE_SIZE: int = 10000
+    IDENTITY_CACHE_TTL: int = 60
+    # Confirmed (user, group) memberships used by the groups router, 0 disables
+    MEMBERSHIP_CACHE_SIZE: int = 50000
+    MEMBERSHIP_CACHE_TTL: int = 60
+    # Serialized group detail / balances responses, tagged with the group version, 0 disables
+    GROUP_CACHE_SIZE: int = 10000
+    GROUP_CACHE_TTL: int = 300
+
+    # Prometheus metrics are served on /metrics by the API and, when
+    # WORKER_METRICS_PORT is set, on that port by each Celery worker.
+    # Statements slower than SLOW_QUERY_SECONDS are logged with their route, 0 disables.
+    WORKER_METRICS_PORT: int = 0
+    SLOW_QUERY_SECONDS: float = 0
 
     class Config:
         case_sensitive = True
@@ -34,5 +99,21 @@ class Settings(BaseSettings):
         super().__init__(**kwargs)
         if not self.SQLALCHEMY_DATABASE_URI:
             self.SQLALCHEMY_DATABASE_URI = f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
+        if not self.SQLALCHEMY_ASYNC_DATABASE_URI:
+            self.SQLALCHEMY_ASYNC_DATABASE_URI = async_database_uri(self.SQLALCHEMY_DATABASE_URI)
+
+# Sync driver prefix -> async driver prefix
+ASYNC_DRIVERS = {
+    "postgresql+psycopg2://": "postgresql+asyncpg://",
+    "postgresql://": "postgresql+asyncpg://",
+    "postgres://": "postgresql+asyncpg://",
+    "sqlite://": "sqlite+aiosqlite://",
+}
+
+def async_database_uri(uri: str) -> str:
+    for prefix, async_prefix in ASYNC_DRIVERS.items():
+        if uri.startswith(prefix):
+            return async_prefix + uri[len(prefix):]
+    return uri
 
 settings = Settings()
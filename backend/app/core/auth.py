@@ -1,4 +1,26 @@
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING
 from app.config import settings
+from app.core.tokens import LocalTokenVerifier
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+if TYPE_CHECKING:
+    from supabase import Client
+
+token_verifier = LocalTokenVerifier.from_settings()
+
+_supabase: "Client | None" = None
+_supabase_lock = threading.Lock()
+
+def get_supabase() -> "Client":
+    """
+    Supabase client for the remote token check, built on first use.
+    The supabase package is slow to import and most requests are verified
+    locally, so neither the import nor the client is paid at startup.
+    """
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return _supabase
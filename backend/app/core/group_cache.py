@@ -0,0 +1,50 @@
+import threading
+from typing import Any, Optional
+from cachetools import TTLCache
+from app.config import settings
+
+class GroupResponseCache:
+    """
+    Per-process cache of serialized group responses (detail, balances), bounded
+    by size (LRU) and age (TTL). Each entry is tagged with the group version it
+    was built at and only served for that version, so writers never have to
+    invalidate it: bumping the version is enough, in every process.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.enabled = ttl > 0
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl if self.enabled else 1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, group_id: int, version: int) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._cache.get((kind, group_id))
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, kind: str, group_id: int, version: int, body: bytes):
+        if not self.enabled:
+            return
+        with self._lock:
+            # Never replace a newer version built by a concurrent request
+            entry = self._cache.get((kind, group_id))
+            if entry is None or entry[0] <= version:
+                self._cache[(kind, group_id)] = (version, body)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self._cache.maxsize}
+
+group_cache = GroupResponseCache(maxsize=settings.GROUP_CACHE_SIZE, ttl=settings.GROUP_CACHE_TTL)
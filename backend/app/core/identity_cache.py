@@ -0,0 +1,71 @@
+import threading
+from typing import Any, Optional
+from cachetools import TTLCache
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.config import settings
+from app.models.user import User
+
+class IdentityCache:
+    """
+    Per-process cache of supabase_id -> User column values, bounded by size (LRU)
+    and age (TTL).
+
+    Cached users are re-attached to the request's session without a query.
+    Invalidation is local to the process, other processes see changes once
+    their entry expires.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, supabase_id: str) -> Optional[User]:
+        with self._lock:
+            values = self._cache.get(supabase_id)
+            if values is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    def set(self, user: User):
+        if not user.supabase_id:
+            return
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        with self._lock:
+            self._cache[user.supabase_id] = values
+
+    def invalidate(self, supabase_id: str):
+        with self._lock:
+            self._cache.pop(supabase_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self._cache.maxsize}
+
+identity_cache = IdentityCache(maxsize=settings.IDENTITY_CACHE_SIZE, ttl=settings.IDENTITY_CACHE_TTL)
+
+async def resolve_user(db: AsyncSession, supabase_id: str) -> Optional[User]:
+    """
+    Looks up the local user for a Supabase identity, hitting the user table only on a cache miss.
+    """
+    user = await identity_cache.get(db, supabase_id)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(User).where(User.supabase_id == supabase_id))
+    user = result.scalars().first()
+    if user is not None:
+        identity_cache.set(user)
+    return user
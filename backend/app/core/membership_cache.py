@@ -0,0 +1,49 @@
+import threading
+from typing import Any
+from cachetools import TTLCache
+from app.config import settings
+
+class MembershipCache:
+    """
+    Per-process cache of confirmed (user_id, group_id) memberships, bounded by
+    size (LRU) and age (TTL). Only positive answers are cached, so a user added
+    to a group is never refused. Code that removes members must call discard().
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.enabled = ttl > 0
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl if self.enabled else 1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, user_id: int, group_id: int) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            if (user_id, group_id) in self._cache:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, user_id: int, group_id: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._cache[(user_id, group_id)] = True
+
+    def discard(self, user_id: int, group_id: int):
+        with self._lock:
+            self._cache.pop((user_id, group_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self._cache.maxsize}
+
+membership_cache = MembershipCache(maxsize=settings.MEMBERSHIP_CACHE_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL)
@@ -0,0 +1,204 @@
+"""
+Prometheus metrics, served on /metrics.
+
+Requests: latency per route template, and the SQL statements each request
+ran with their total time. Statements are attributed to a request through a
+context variable set by MetricsMiddleware and read by the engine's cursor
+events, which also log statements slower than SLOW_QUERY_SECONDS with their
+route. Pool usage and queue depths are collected at scrape time. Celery task
+runtimes are recorded by the workers (app.workers.task_metrics).
+
+With several processes per host (uvicorn workers, prefork Celery pools) set
+PROMETHEUS_MULTIPROC_DIR so that the samples of every process are exposed.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+import redis
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.core.redis import redis_client
+from app.db.pool import pool_status
+
+logger = logging.getLogger(__name__)
+
+# Requests that matched no route share one label, so scans cannot add series
+UNMATCHED_ROUTE = "unmatched"
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route", "status"],
+)
+request_sql_statements = Histogram(
+    "http_request_sql_statements", "SQL statements run per request",
+    ["method", "route"], buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64, 128),
+)
+request_sql_seconds = Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL statements per request",
+    ["method", "route"],
+)
+slow_queries = Counter("db_slow_queries", "Statements slower than SLOW_QUERY_SECONDS", ["route"])
+auth_latency = Histogram("auth_verify_duration_seconds", "Access token verification time", ["method"])
+
+class RequestStats:
+    """
+    SQL statements and time of the request being served.
+    """
+
+    def __init__(self, scope: dict[str, Any]):
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # The matched route is set on the scope by the router. Depending on the
+        # FastAPI version, a route of an included router reports its path with
+        # or without the router's prefix: the prefix is whatever part of the
+        # request path comes before the route's own segments.
+        template = getattr(self.scope.get("route"), "path", None)
+        if template is None:
+            return UNMATCHED_ROUTE
+        segments = [s for s in self.scope["path"].split("/") if s]
+        own = len([s for s in template.split("/") if s])
+        prefix = segments[:max(len(segments) - own, 0)]
+        return "/" + "/".join(prefix) + template if prefix else template
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL statement count and SQL time of every HTTP request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            method, route = scope["method"], stats.route
+            request_latency.labels(method, route, str(status)).observe(elapsed)
+            request_sql_statements.labels(method, route).observe(stats.statements)
+            request_sql_seconds.labels(method, route).observe(stats.sql_seconds)
+
+def instrument_engine(engine: Engine):
+    """
+    Times every statement sent through `engine`, adds it to the current
+    request's stats and logs it when slower than SLOW_QUERY_SECONDS.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+        if settings.SLOW_QUERY_SECONDS and elapsed >= settings.SLOW_QUERY_SECONDS:
+            route = stats.route if stats is not None else "-"
+            slow_queries.labels(route).inc()
+            logger.warning("Slow query (%.3fs) on %s: %s", elapsed, route, " ".join(statement.split()))
+
+class PoolCollector(Collector):
+    """
+    Pool usage and checkout counters of each engine, see app.db.pool.
+    """
+
+    def __init__(self, engines: dict[str, Engine]):
+        self.engines = engines
+
+    def collect(self):
+        gauges = {
+            key: GaugeMetricFamily(f"db_pool_{key}", description, labels=["engine"])
+            for key, description in (
+                ("size", "Connections the pool keeps open"),
+                ("checked_out", "Connections in use"),
+                ("checked_in", "Idle connections in the pool"),
+                ("overflow", "Connections open beyond the pool size"),
+            )
+        }
+        counters = {
+            key: CounterMetricFamily(f"db_pool_{name}", description, labels=["engine"])
+            for key, name, description in (
+                ("checkouts", "checkouts", "Connections handed out"),
+                ("timeouts", "timeouts", "Checkouts that timed out waiting for a connection"),
+                ("wait_seconds_total", "wait_seconds", "Time spent waiting for a connection"),
+            )
+        }
+        for name, engine in self.engines.items():
+            status = pool_status(name, engine)
+            for key, metric in {**gauges, **counters}.items():
+                if key in status:
+                    metric.add_metric([name], status[key])
+        yield from gauges.values()
+        yield from counters.values()
+
+class QueueDepthCollector(Collector):
+    """
+    Length of Redis lists used as queues, read on every scrape.
+    A queue that cannot be read is left out of the scrape.
+    """
+
+    def __init__(self, queues: dict[str, str]):
+        self.queues = queues
+
+    def collect(self):
+        depth = GaugeMetricFamily("queue_depth", "Messages waiting in a queue", labels=["queue"])
+        for name, key in self.queues.items():
+            try:
+                depth.add_metric([name], redis_client.llen(key))
+            except redis.RedisError:
+                continue
+        yield depth
+
+# Collected at scrape time, registered again on every multiprocess scrape
+_collectors: list[Collector] = []
+
+def register_collector(collector: Collector):
+    _collectors.append(collector)
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        REGISTRY.register(collector)
+
+def scrape_registry() -> CollectorRegistry:
+    """
+    This process's registry, or one aggregating the samples every process
+    wrote to PROMETHEUS_MULTIPROC_DIR.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _collectors:
+        registry.register(collector)
+    return registry
+
+def render_metrics() -> bytes:
+    return generate_latest(scrape_registry())
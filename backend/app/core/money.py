@@ -0,0 +1,58 @@
+"""
+Money as integer cents.
+
+Amounts are stored (BIGINT) and computed on as plain ints of minor units, so
+sums, nets and solver inputs are exact without Decimal arithmetic or rounding
+tolerances. Decimal only appears at the API boundary: request amounts are
+validated to two decimal places and converted with to_cents(), responses are
+rendered with from_cents().
+"""
+from decimal import Decimal
+from typing import Annotated, Sequence
+from pydantic import Field
+
+CENTS_PER_UNIT = 100
+
+# Request amounts: positive, at most two decimal places, and small enough that
+# any realistic sum of them fits a BIGINT of cents
+MoneyAmount = Annotated[Decimal, Field(gt=0, max_digits=17, decimal_places=2)]
+
+def to_cents(amount: Decimal | str | int) -> int:
+    """
+    Exact conversion of a unit amount to cents, raises ValueError for fractions of a cent.
+    """
+    cents = Decimal(amount) * CENTS_PER_UNIT
+    if cents != cents.to_integral_value():
+        raise ValueError(f"{amount} has more than two decimal places")
+    return int(cents)
+
+def from_cents(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+def allocate(total: int, weights: Sequence[int]) -> list[int]:
+    """
+    Splits `total` cents in proportion to non-negative integer `weights`.
+    The parts always sum to `total` exactly: every part gets its floored
+    share and the cents left over go, one each, to the largest remainders
+    (ties to the earlier weight).
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0 or any(w < 0 for w in weights):
+        raise ValueError("Weights must be non-negative with a positive sum")
+
+    parts = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        share, remainder = divmod(total * weight, weight_sum)
+        parts.append(share)
+        remainders.append((-remainder, index))
+
+    for _, index in sorted(remainders)[:total - sum(parts)]:
+        parts[index] += 1
+    return parts
+
+def split_evenly(total: int, count: int) -> list[int]:
+    """
+    `total` cents in `count` parts that differ by at most one cent, e.g. 1000 / 3 -> 334, 333, 333.
+    """
+    return allocate(total, [1] * count)
@@ -0,0 +1,13 @@
+import ssl
+import redis
+from app.config import settings
+
+# Same TLS handling as the Celery broker for Upstash/Cloud Redis (rediss://)
+_ssl_kwargs = {"ssl_cert_reqs": ssl.CERT_NONE} if settings.REDIS_URL.startswith("rediss://") else {}
+
+# Connections are opened lazily on first command
+redis_client = redis.Redis.from_url(settings.REDIS_URL, **_ssl_kwargs)
+
+# Confirmed payments waiting for the next on-chain batch, shared by every
+# worker and read by the API for the queue depth metric
+PENDING_SETTLEMENTS_KEY = "settlements:pending"
@@ -0,0 +1,132 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import jwt
+from jwt import PyJWKClient
+from app.config import settings
+
+# Asymmetric algorithms Supabase signs with when JWT signing keys are enabled
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+
+@dataclass
+class AuthenticatedUser:
+    """
+    Identity extracted from a verified access token.
+    Exposes the same `id` / `email` attributes as the Supabase user object.
+    """
+    id: str
+    email: Optional[str] = None
+    claims: dict[str, Any] = field(default_factory=dict)
+
+class UnverifiableTokenError(Exception):
+    """
+    The token could not be checked locally (no matching key or secret configured).
+    Unlike jwt.InvalidTokenError this does not mean the token is bad.
+    """
+
+class LocalTokenVerifier:
+    """
+    Verifies Supabase access tokens in-process.
+
+    HS256 tokens are checked against the project's JWT secret, RS256/ES256 tokens
+    against the project's JWKS, which is cached for `jwks_ttl` seconds. A token
+    signed with an unknown key id triggers one JWKS refresh (key rotation), at most
+    once per `refresh_cooldown` seconds.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        jwks_ttl: int = 600,
+        refresh_cooldown: int = 30,
+        leeway: int = 0,
+    ):
+        self.secret = secret
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.refresh_cooldown = refresh_cooldown
+        self.jwks_client = PyJWKClient(jwks_url, cache_jwk_set=True, lifespan=jwks_ttl) if jwks_url else None
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "LocalTokenVerifier":
+        jwks_url = settings.SUPABASE_JWKS_URL
+        issuer = None
+        if settings.SUPABASE_URL:
+            base = settings.SUPABASE_URL.rstrip("/")
+            jwks_url = jwks_url or f"{base}/auth/v1/.well-known/jwks.json"
+            issuer = f"{base}/auth/v1"
+        return cls(
+            secret=settings.SUPABASE_JWT_SECRET,
+            jwks_url=jwks_url,
+            audience=settings.SUPABASE_JWT_AUDIENCE,
+            issuer=issuer,
+            jwks_ttl=settings.JWKS_CACHE_TTL,
+            leeway=settings.JWT_LEEWAY,
+        )
+
+    def verify(self, token: str) -> AuthenticatedUser:
+        """
+        Returns the token's user, raises jwt.InvalidTokenError for bad tokens and
+        UnverifiableTokenError when no key is available to decide.
+        """
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+
+        if algorithm == "HS256":
+            if not self.secret:
+                raise UnverifiableTokenError("No JWT secret configured for HS256 tokens")
+            key = self.secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = self._signing_key(header.get("kid"))
+        else:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={"require": ["exp", "sub"], "verify_aud": self.audience is not None},
+        )
+        return AuthenticatedUser(id=claims["sub"], email=claims.get("email"), claims=claims)
+
+    def _signing_key(self, kid: Optional[str]):
+        if self.jwks_client is None:
+            raise UnverifiableTokenError("No JWKS configured for asymmetric tokens")
+
+        try:
+            key = self._match(self.jwks_client.get_signing_keys(), kid)
+            if key is None and self._may_refresh():
+                # Unknown kid: the signing keys were probably rotated
+                key = self._match(self.jwks_client.get_signing_keys(refresh=True), kid)
+        except jwt.PyJWKClientError as e:
+            raise UnverifiableTokenError(str(e)) from e
+
+        if key is None:
+            raise UnverifiableTokenError(f"No signing key matches kid {kid!r}")
+        return key
+
+    def _may_refresh(self) -> bool:
+        # Bounds JWKS fetches caused by tokens with made-up key ids
+        with self._refresh_lock:
+            now = time.monotonic()
+            if now - self._last_refresh < self.refresh_cooldown:
+                return False
+            self._last_refresh = now
+            return True
+
+    @staticmethod
+    def _match(keys, kid: Optional[str]):
+        for key in keys:
+            if kid is None or key.key_id == kid:
+                return key.key
+        return None
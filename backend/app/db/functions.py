@@ -0,0 +1,23 @@
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+class utcnow(FunctionElement):
+    """
+    Server-side current timestamp for column defaults.
+
+    Same as now() on Postgres. SQLite's CURRENT_TIMESTAMP has no fractional
+    part and so compares (as text) differently from the timestamps SQLAlchemy
+    binds, which breaks (created_at, id) keyset comparisons. There it is
+    rendered in SQLAlchemy's own storage format instead.
+    """
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "now()"
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    return "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
@@ -0,0 +1,47 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+A cursor is the (created_at, id) of the last row of a page, so fetching the
+next page is an index range scan that starts right after it instead of an
+OFFSET that re-reads every earlier row.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Optional, Sequence
+from sqlalchemy import Select, tuple_
+
+Cursor = tuple[datetime, int]
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Raises ValueError for anything encode_cursor did not produce.
+    """
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def keyset(stmt: Select, created_at_col, id_col, cursor: Optional[Cursor], limit: int) -> Select:
+    """
+    Restricts `stmt` to the rows after `cursor`, newest first. Selects one row
+    more than `limit` so page() can tell whether another page follows.
+    """
+    if cursor is not None:
+        stmt = stmt.where(tuple_(created_at_col, id_col) < tuple_(*cursor))
+    return stmt.order_by(created_at_col.desc(), id_col.desc()).limit(limit + 1)
+
+def page(rows: Sequence[Any], limit: int) -> dict[str, Any]:
+    """
+    Splits the rows of a keyset() query into the page and the cursor of the next one.
+    """
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor}
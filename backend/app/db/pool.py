@@ -0,0 +1,145 @@
+"""
+Connection pool configuration and checkout metrics for the sync and async engines.
+
+DB_POOL_MODE "queue" keeps connections open in-process, "null" opens one per
+checkout and leaves pooling to a transaction-pooled PgBouncer. Pre-ping is
+"always" (a round trip on every checkout), "idle" (only for connections that
+sat in the pool longer than DB_POOL_PRE_PING_IDLE seconds) or "never".
+"""
+import threading
+import time
+from typing import Any
+from uuid import uuid4
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from app.config import settings
+
+class PoolMetrics:
+    """
+    Checkout counters of one engine's pool. Wait time is the time it took to
+    hand out a connection, including opening it when the pool had none.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                "wait_seconds_avg": round(self.wait_total / attempts, 6) if attempts else 0.0,
+            }
+
+# Engine name -> metrics, filled in by engine_options()
+pool_metrics: dict[str, PoolMetrics] = {}
+
+class _InstrumentedPool:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+def _instrumented(pool_class: type, metrics: PoolMetrics) -> type:
+    # A subclass per engine, so the metrics survive pool.recreate() on dispose()
+    return type(f"Instrumented{pool_class.__name__}", (_InstrumentedPool, pool_class), {"metrics": metrics})
+
+def engine_options(name: str, uri: str, is_async: bool = False) -> dict[str, Any]:
+    """
+    Keyword arguments for create_engine / create_async_engine built from the DB_* settings.
+    """
+    metrics = pool_metrics.setdefault(name, PoolMetrics(name))
+
+    if settings.DB_POOL_MODE == "queue":
+        pool_class = AsyncAdaptedQueuePool if is_async else QueuePool
+        options = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+        }
+    elif settings.DB_POOL_MODE == "null":
+        pool_class = NullPool
+        options = {}
+    else:
+        raise ValueError(f"Unknown DB_POOL_MODE: {settings.DB_POOL_MODE}")
+
+    if settings.DB_POOL_PRE_PING not in ("always", "idle", "never"):
+        raise ValueError(f"Unknown DB_POOL_PRE_PING: {settings.DB_POOL_PRE_PING}")
+
+    options["poolclass"] = _instrumented(pool_class, metrics)
+    options["pool_pre_ping"] = settings.DB_POOL_PRE_PING == "always"
+
+    if uri.startswith("postgresql+asyncpg"):
+        connect_args = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+        if settings.DB_POOL_MODE == "null":
+            # Transaction pooling hands each transaction a different server
+            # connection, named prepared statements must not collide there
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+        options["connect_args"] = connect_args
+    return options
+
+def install_idle_pre_ping(engine: Engine, idle_seconds: float):
+    """
+    Pings a connection on checkout only if it has been idle in the pool for
+    longer than `idle_seconds`. A failed ping makes the pool replace it.
+    """
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise exc.DisconnectionError(str(e)) from e
+        if alive is False:
+            raise exc.DisconnectionError("Idle connection failed pre-ping")
+
+def pool_status(name: str, engine: Engine) -> dict[str, Any]:
+    """
+    Current usage of an engine's pool together with its checkout metrics.
+    """
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    status.update(pool_metrics[name].stats())
+    return status
@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+from typing import Iterator, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryCounter:
+    """
+    Records every SQL statement sent through an engine while active.
+    An executemany call counts as one statement.
+    """
+
+    def __init__(self, engine: Union[Engine, AsyncEngine]):
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+@contextmanager
+def assert_max_queries(engine: Union[Engine, AsyncEngine], limit: int, label: str = "block") -> Iterator[QueryCounter]:
+    """
+    Fails with QueryBudgetExceeded if the block runs more than `limit` SQL statements.
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(f"  {i + 1}. {' '.join(s.split())[:120]}" for i, s in enumerate(counter.statements))
+        raise QueryBudgetExceeded(f"{label} ran {counter.count} SQL statements, budget is {limit}:\n{statements}")
@@ -1,6 +1,24 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from app.config import settings
+from app.db.pool import engine_options, install_idle_pre_ping
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
+# Sync engine: Celery workers, scripts and migrations
+engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URI,
+    **engine_options("sync", settings.SQLALCHEMY_DATABASE_URI)
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine: request handlers. Objects stay loaded after commit, since
+# refreshing an expired attribute would need an implicit await.
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    **engine_options("async", settings.SQLALCHEMY_ASYNC_DATABASE_URI, is_async=True)
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+if settings.DB_POOL_PRE_PING == "idle":
+    install_idle_pre_ping(engine, settings.DB_POOL_PRE_PING_IDLE)
+    install_idle_pre_ping(async_engine.sync_engine, settings.DB_POOL_PRE_PING_IDLE)
@@ -0,0 +1,11 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+def dialect_insert(db: Session, model):
+    """
+    Returns an INSERT construct for `model` that supports ON CONFLICT clauses
+    on the dialect the session is bound to (PostgreSQL in production, SQLite locally).
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
@@ -1,14 +1,38 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api import users, expenses, payments, groups
-from app.db.session import engine
+from app.db.session import engine, async_engine
 from app.db.base import Base
+from app.db.pool import pool_status
+from app.core.metrics import (
+    MetricsMiddleware, PoolCollector, QueueDepthCollector, instrument_engine, register_collector, render_metrics,
+)
+from app.core.redis import PENDING_SETTLEMENTS_KEY
+from prometheus_client import CONTENT_TYPE_LATEST
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is managed by Alembic. DB_CREATE_ALL only bootstraps empty
+    # development databases, nothing touches the database at import time.
+    if settings.DB_CREATE_ALL:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    yield
+    await async_engine.dispose()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json", lifespan=lifespan)
 
-app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
+# Request latency and per-request SQL, pool usage and queue depths on /metrics
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+register_collector(PoolCollector({"sync": engine, "async": async_engine.sync_engine}))
+register_collector(QueueDepthCollector({
+    "celery": "celery", # Celery's default queue, settlement tasks wait here
+    "settlements_pending": PENDING_SETTLEMENTS_KEY,
+}))
+app.add_middleware(MetricsMiddleware)
 
 # Set all CORS enabled origins
 app.add_middleware(
@@ -27,3 +51,16 @@ app.include_router(payments.router, prefix=f"{settings.API_V1_STR}/payments", ta
 @app.get("/")
 def root():
     return {"message": "Welcome to Expense Settlement System"}
+
+@app.get("/health/db")
+def database_pool_status():
+    # Pool usage and checkout wait per engine, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW
+    return {
+        "sync": pool_status("sync", engine),
+        "async": pool_status("async", async_engine.sync_engine),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # A sync route, the queue depth collector makes blocking Redis calls
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -1,12 +1,50 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, Boolean, Index, CheckConstraint
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
-class BalanceEdge(Base):
+class PairBalance(Base):
+    """
+    Net debt between two users within a group, one row per unordered pair per group.
+    Users are stored in canonical order (user_a_id < user_b_id).
+    A positive amount means user_a owes user_b, a negative amount means user_b owes user_a.
+    Amounts are in cents.
+    """
     id = Column(Integer, primary_key=True, index=True)
-    from_user_id = Column(Integer, ForeignKey("user.id"))
-    to_user_id = Column(Integer, ForeignKey("user.id"))
-    amount = Column(Numeric(10, 2), nullable=False)
+    group_id = Column(Integer, ForeignKey("group.id"), nullable=False)
+    user_a_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    user_b_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False, default=0)
     
-    from_user = relationship("User", foreign_keys=[from_user_id])
-    to_user = relationship("User", foreign_keys=[to_user_id])
+    user_a = relationship("User", foreign_keys=[user_a_id])
+    user_b = relationship("User", foreign_keys=[user_b_id])
+
+    __table_args__ = (
+        Index("ix_pairbalance_group_pair", "group_id", "user_a_id", "user_b_id", unique=True),
+        CheckConstraint("user_a_id < user_b_id", name="ck_pairbalance_ordered"),
+    )
+
+    @property
+    def from_user(self):
+        # The debtor side of the pair
+        return self.user_a if self.amount_cents > 0 else self.user_b
+
+    @property
+    def to_user(self):
+        # The creditor side of the pair
+        return self.user_b if self.amount_cents > 0 else self.user_a
+
+class UserNetBalance(Base):
+    """
+    Running position of a user within a group, kept in step with PairBalance.
+    `amount_cents` is the net: positive means the user is owed money, negative means they owe.
+    `owes_cents` and `owed_cents` are the gross totals on each side.
+    `dirty` marks users whose debts changed since the last simplification run.
+    """
+    group_id = Column(Integer, ForeignKey("group.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True, index=True)
+    amount_cents = Column(BigInteger, nullable=False, default=0)
+    owes_cents = Column(BigInteger, nullable=False, default=0)
+    owed_cents = Column(BigInteger, nullable=False, default=0)
+    dirty = Column(Boolean, nullable=False, default=False, index=True)
+    
+    user = relationship("User")
@@ -1,22 +1,38 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.core.money import from_cents
+from app.db.functions import utcnow
 
 class Expense(Base):
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("group.id"))
     paid_by_id = Column(Integer, ForeignKey("user.id"))
-    amount = Column(Numeric(10, 2), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=utcnow(), nullable=False)
     
     paid_by = relationship("User", foreign_keys=[paid_by_id])
     group = relationship("Group", back_populates="expenses")
     splits = relationship("ExpenseSplit", back_populates="expense")
 
+    __table_args__ = (
+        # Keyset pagination of a group's expenses
+        Index("ix_expense_group_created", "group_id", "created_at", "id"),
+    )
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
 class ExpenseSplit(Base):
     id = Column(Integer, primary_key=True, index=True)
     expense_id = Column(Integer, ForeignKey("expense.id"))
     user_id = Column(Integer, ForeignKey("user.id"))
-    amount = Column(Numeric(10, 2), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
     
     expense = relationship("Expense", back_populates="splits")
     user = relationship("User")
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
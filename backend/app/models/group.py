@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, DateTime
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.db.functions import utcnow
 
 group_members = Table(
     "group_members",
@@ -12,6 +13,10 @@ group_members = Table(
 class Group(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=utcnow(), nullable=False)
+    # Bumped in the same transaction as every change visible in the group's
+    # detail or balances, tags the cached responses and their ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     members = relationship("User", secondary=group_members, backref="groups")
     expenses = relationship("Expense", back_populates="group")
@@ -0,0 +1,48 @@
+import enum
+from sqlalchemy import Column, Integer, ForeignKey, Enum, DateTime, JSON, Index
+from app.db.base import Base
+from app.db.functions import utcnow
+
+class LedgerEventKind(str, enum.Enum):
+    EXPENSE_POSTED = "expense_posted"
+    PAYMENT_CONFIRMED = "payment_confirmed"
+    SIMPLIFICATION_APPLIED = "simplification_applied"
+
+class LedgerEvent(Base):
+    """
+    Append-only record of every change to a group's pair ledger.
+    `deltas` holds the signed canonical pair changes as [user_a_id, user_b_id, cents],
+    so replaying a group's events in any order rebuilds its PairBalance rows.
+    `ref_id` is the expense or payment behind the event (none for simplifications).
+    """
+    id = Column(Integer, primary_key=True)
+    group_id = Column(Integer, ForeignKey("group.id"), nullable=False)
+    kind = Column(Enum(LedgerEventKind), nullable=False)
+    ref_id = Column(Integer, nullable=True)
+    deltas = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=utcnow(), nullable=False)
+
+    __table_args__ = (
+        # Replay after a snapshot, and point-in-time cut-offs
+        Index("ix_ledgerevent_group_id", "group_id", "id"),
+        Index("ix_ledgerevent_group_created", "group_id", "created_at"),
+    )
+
+class BalanceSnapshot(Base):
+    """
+    A group's pair ledger folded up to and including event `last_event_id`.
+    `pairs` holds the non-zero [user_a_id, user_b_id, cents] rows and
+    `as_of` the creation time of the newest event it contains.
+    A snapshot with last_event_id = 0 is a baseline for history older than the event log.
+    """
+    id = Column(Integer, primary_key=True)
+    group_id = Column(Integer, ForeignKey("group.id"), nullable=False)
+    last_event_id = Column(Integer, nullable=False)
+    as_of = Column(DateTime(timezone=True), nullable=False)
+    pairs = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=utcnow(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_balancesnapshot_group_event", "group_id", "last_event_id"),
+        Index("ix_balancesnapshot_group_as_of", "group_id", "as_of"),
+    )
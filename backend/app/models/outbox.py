@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+from app.db.base import Base
+from app.db.functions import utcnow
+
+class OutboxMessage(Base):
+    """
+    A message to publish once the transaction that wrote it commits.
+    The relay hands pending messages (dispatched_at is NULL) to their topic's
+    publisher in batches. (topic, key) is unique, so a message is enqueued once.
+    """
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=utcnow(), nullable=False)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_outboxmessage_topic_key", "topic", "key", unique=True),
+        # Only the pending tail is scanned by the relay
+        Index(
+            "ix_outboxmessage_pending", "id",
+            postgresql_where=dispatched_at.is_(None), sqlite_where=dispatched_at.is_(None),
+        ),
+        Index("ix_outboxmessage_dispatched_at", "dispatched_at"),
+    )
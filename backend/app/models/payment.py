@@ -1,8 +1,9 @@
 import enum
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, Enum, DateTime
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Enum, DateTime, Index, JSON
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.core.money import from_cents
+from app.db.functions import utcnow
 
 class PaymentStatus(str, enum.Enum):
     PENDING = "pending"
@@ -13,14 +14,40 @@ class PaymentMethod(str, enum.Enum):
     MANUAL = "manual"   # Cash, Venmo (Requires Receiver Confirmation)
     IN_APP = "in_app"   # Stripe, Crypto (Auto-Confirmed by System)
 
+class SettlementStatus(str, enum.Enum):
+    SUBMITTED = "submitted" # Transaction sent, waiting for a receipt
+    CONFIRMED = "confirmed" # Mined successfully
+    FAILED = "failed"       # Reverted, queued again for the next batch
+
 class Payment(Base):
     id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("group.id"), nullable=True, index=True)
     from_user_id = Column(Integer, ForeignKey("user.id"))
     to_user_id = Column(Integer, ForeignKey("user.id"))
-    amount = Column(Numeric(10, 2), nullable=False)
+    amount_cents = Column(BigInteger, nullable=False)
     status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
     method = Column(Enum(PaymentMethod), default=PaymentMethod.MANUAL)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=utcnow())
+    
+    # On-chain settlement tracking, filled in by the settlement writer
+    settlement_status = Column(Enum(SettlementStatus), nullable=True, index=True)
+    settlement_tx_hash = Column(String, nullable=True, index=True)
+    settlement_submitted_at = Column(DateTime(timezone=True), nullable=True)
+    # Nonce and gas price of the transaction, a stuck one is replaced with the
+    # same nonce. Earlier hashes sent with that nonce are kept, any may be mined.
+    settlement_nonce = Column(BigInteger, nullable=True)
+    settlement_gas_price = Column(BigInteger, nullable=True)
+    settlement_replaced_tx_hashes = Column(JSON, nullable=True)
     
     from_user = relationship("User", foreign_keys=[from_user_id])
     to_user = relationship("User", foreign_keys=[to_user_id])
+
+    __table_args__ = (
+        # Keyset pagination of a user's payments, one index per side
+        Index("ix_payment_from_created", "from_user_id", "created_at", "id"),
+        Index("ix_payment_to_created", "to_user_id", "created_at", "id"),
+    )
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
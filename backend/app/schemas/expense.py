@@ -1,22 +1,60 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, model_validator
+from typing import List, Optional
 from decimal import Decimal
+from datetime import datetime
+from app.core.money import MoneyAmount, from_cents, split_evenly, to_cents
 
 class ExpenseSplitCreate(BaseModel):
     user_id: int
-    amount: Decimal
+    # Omitted on every split: the expense is shared evenly, see ExpenseCreate
+    amount: Optional[MoneyAmount] = None
+
+    @property
+    def amount_cents(self) -> int:
+        return to_cents(self.amount)
 
 class ExpenseCreate(BaseModel):
     group_id: int
     paid_by_id: int
-    amount: Decimal
+    amount: MoneyAmount
     splits: List[ExpenseSplitCreate]
 
+    @property
+    def amount_cents(self) -> int:
+        return to_cents(self.amount)
+
+    @model_validator(mode="after")
+    def _splits_add_up(self):
+        # Splits without amounts share the expense evenly, the leftover cents
+        # going to the first splits (10.00 / 3 -> 3.34, 3.33, 3.33)
+        unpriced = [split for split in self.splits if split.amount is None]
+        if unpriced and len(unpriced) < len(self.splits):
+            raise ValueError("Give an amount for every split or for none")
+        if unpriced:
+            for split, cents in zip(self.splits, split_evenly(self.amount_cents, len(self.splits))):
+                split.amount = from_cents(cents)
+
+        # Every cent paid is owed by someone, or the ledger would not net to zero
+        split_cents = sum(split.amount_cents for split in self.splits)
+        if split_cents != self.amount_cents:
+            raise ValueError(f"Splits add up to {from_cents(split_cents)}, not {from_cents(self.amount_cents)}")
+        return self
+
 class ExpenseResponse(BaseModel):
     id: int
     group_id: int
     paid_by_id: int
     amount: Decimal
+    created_at: datetime
     
     class Config:
         from_attributes = True
+
+class ExpenseImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ExpenseImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ExpenseImportError] = [] # Capped, `failed` has the full count
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
 from decimal import Decimal
+from datetime import datetime
 
 class UserBase(BaseModel):
     id: int
@@ -23,6 +24,7 @@ class ExpenseResponse(BaseModel):
     group_id: int
     paid_by_id: int
     amount: Decimal
+    created_at: datetime
     paid_by: UserBase
     splits: List[ExpenseSplitResponse] = []
 
@@ -36,13 +38,16 @@ class GroupCreate(BaseModel):
 class GroupResponse(BaseModel):
     id: int
     name: str
+    created_at: datetime
     
     class Config:
         from_attributes = True
 
 class GroupDetailResponse(GroupResponse):
     members: List[UserBase]
+    # Most recent expenses only, the rest via GET /groups/{id}/expenses?cursor=expenses_next_cursor
     expenses: List[ExpenseResponse] = []
+    expenses_next_cursor: Optional[str] = None
 
 class AddMemberRequest(BaseModel):
     email: str
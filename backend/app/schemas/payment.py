@@ -1,23 +1,32 @@
 from pydantic import BaseModel
 from decimal import Decimal
-from app.models.payment import PaymentStatus, PaymentMethod
+from app.models.payment import PaymentStatus, PaymentMethod, SettlementStatus
 from datetime import datetime
 from typing import Optional
+from app.core.money import MoneyAmount, to_cents
 
 class PaymentCreate(BaseModel):
+    group_id: int
     from_user_id: int
     to_user_id: int
-    amount: Decimal
+    amount: MoneyAmount
     method: PaymentMethod = PaymentMethod.MANUAL
 
+    @property
+    def amount_cents(self) -> int:
+        return to_cents(self.amount)
+
 class PaymentResponse(BaseModel):
     id: int
+    group_id: Optional[int] = None
     from_user_id: int
     to_user_id: int
     amount: Decimal
     status: PaymentStatus
     method: PaymentMethod
     created_at: datetime
+    settlement_status: Optional[SettlementStatus] = None
+    settlement_tx_hash: Optional[str] = None
 
     class Config:
         from_attributes = True
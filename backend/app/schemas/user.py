@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
+from decimal import Decimal
+from app.core.money import from_cents
 
 class UserCreate(BaseModel):
     name: str
@@ -15,3 +17,12 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class UserBalanceResponse(BaseModel):
+    net: Decimal     # Positive: others owe you. Negative: you owe others.
+    owes: Decimal    # Total you owe
+    owed: Decimal    # Total owed to you
+
+    @classmethod
+    def from_cents(cls, position: dict[str, int]) -> "UserBalanceResponse":
+        return cls(**{key: from_cents(cents) for key, cents in position.items()})
@@ -1,63 +1,196 @@
+from collections import defaultdict
+from typing import Optional
+from sqlalchemy import select, union_all, case, func
 from sqlalchemy.orm import Session
-from app.models.balance import BalanceEdge
-from decimal import Decimal
-
-def get_balance_edge(db: Session, from_user: int, to_user: int) -> BalanceEdge | None:
-    return db.query(BalanceEdge).filter(
-        BalanceEdge.from_user_id == from_user,
-        BalanceEdge.to_user_id == to_user
-    ).first()
-
-def update_balance(db: Session, from_user: int, to_user: int, amount: Decimal):
-    # Ensure canonical direction to avoid duplicate edges (e.g., always smaller_id -> larger_id)
-    # But the user specified "from_user -> to_user" represents debt graph.
-    # If A owes B 10, we have Edge(A, B, 10).
-    # If we want to reduce debt, we decrease amount.
-    # If amount becomes negative, we flip the edge.
-    
-    # Check if edge exists A->B
-    edge = get_balance_edge(db, from_user, to_user)
-    if edge:
-        edge.amount = amount
-        if edge.amount == 0:
-            db.delete(edge)
-        return
+from app.db.upsert import dialect_insert
+from app.models.balance import PairBalance, UserNetBalance
+from app.models.ledger import LedgerEventKind
+from app.services.ledger import ledger_event_row, record_ledger_events
 
-    # Check if edge exists B->A
-    reverse_edge = get_balance_edge(db, to_user, from_user)
-    if reverse_edge:
-        # If we are setting A->B to X, it means B->A should be -X
-        # But we usually don't set negative balances.
-        # If the caller says "A owes B amount", and we have B->A, 
-        # it means we should reduce B->A by amount? No.
-        # This function sets the absolute state.
-        # Let's make this function simpler: set the edge A->B to amount.
-        # If amount is negative, it means B->A with abs(amount).
-        pass
-    
-    if amount > 0:
-        # Create or update A->B
-        if reverse_edge:
-            db.delete(reverse_edge) # Should not happen if logic is correct upstream, but safe to clear
+def canonical_pair(debtor_id: int, creditor_id: int, amount: int) -> tuple[int, int, int]:
+    """
+    Maps "debtor owes creditor amount" onto the canonical (user_a, user_b, signed amount) form.
+    """
+    if debtor_id < creditor_id:
+        return debtor_id, creditor_id, amount
+    return creditor_id, debtor_id, -amount
+
+def to_pair_deltas(deltas: dict[tuple[int, int], int]) -> dict[tuple[int, int], int]:
+    """
+    Folds (debtor_id, creditor_id) -> cents changes into one signed delta per canonical pair.
+    """
+    pair_deltas = defaultdict(int)
+    for (debtor_id, creditor_id), amount in deltas.items():
+        if debtor_id == creditor_id:
+            continue
+        user_a, user_b, signed = canonical_pair(debtor_id, creditor_id, amount)
+        pair_deltas[(user_a, user_b)] += signed
+    return pair_deltas
+
+def upsert_pair_deltas(
+    db: Session, group_id: int, pair_deltas: dict[tuple[int, int], int]
+) -> dict[tuple[int, int], int]:
+    """
+    Adds signed deltas to a group's PairBalance rows with one INSERT ... ON CONFLICT DO UPDATE.
+    Returns the resulting amount of every written pair.
+    """
+    rows = [
+        {"group_id": group_id, "user_a_id": user_a, "user_b_id": user_b, "amount_cents": amount}
+        for (user_a, user_b), amount in pair_deltas.items()
+        if amount != 0
+    ]
+    if not rows:
+        return {}
+
+    stmt = dialect_insert(db, PairBalance)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PairBalance.group_id, PairBalance.user_a_id, PairBalance.user_b_id],
+        set_={"amount_cents": PairBalance.amount_cents + stmt.excluded.amount_cents},
+    ).returning(PairBalance.user_a_id, PairBalance.user_b_id, PairBalance.amount_cents)
+    result = db.execute(stmt, rows)
+    return {(row.user_a_id, row.user_b_id): row.amount_cents for row in result}
+
+def update_user_positions(
+    db: Session,
+    group_id: int,
+    pair_deltas: dict[tuple[int, int], int],
+    new_amounts: dict[tuple[int, int], int],
+    mark_dirty: bool = True,
+):
+    """
+    Applies the effect of a group's pair changes to UserNetBalance in one upsert.
+
+    The net moves by the delta itself. The gross `owes`/`owed` totals move by the
+    difference between the old and new debtor-side amounts of each pair, where
+    the old amount is recovered as new - delta (no extra read).
+    """
+    positions = defaultdict(lambda: [0, 0, 0]) # net, owes, owed
+    for pair, new in new_amounts.items():
+        user_a, user_b = pair
+        old = new - pair_deltas[pair]
+        a_owes = max(new, 0) - max(old, 0)
+        b_owes = max(-new, 0) - max(-old, 0)
+        
+        position_a = positions[user_a]
+        position_a[0] -= pair_deltas[pair]
+        position_a[1] += a_owes
+        position_a[2] += b_owes
         
-        new_edge = BalanceEdge(from_user_id=from_user, to_user_id=to_user, amount=amount)
-        db.add(new_edge)
-    elif amount < 0:
-        # Create or update B->A
-        if edge:
-            db.delete(edge)
+        position_b = positions[user_b]
+        position_b[0] += pair_deltas[pair]
+        position_b[1] += b_owes
+        position_b[2] += a_owes
+
+    if not positions:
+        return
+
+    rows = [
+        {"group_id": group_id, "user_id": user_id, "amount_cents": net, "owes_cents": owes, "owed_cents": owed, "dirty": mark_dirty}
+        for user_id, (net, owes, owed) in positions.items()
+    ]
+    stmt = dialect_insert(db, UserNetBalance)
+    set_ = {
+        "amount_cents": UserNetBalance.amount_cents + stmt.excluded.amount_cents,
+        "owes_cents": UserNetBalance.owes_cents + stmt.excluded.owes_cents,
+        "owed_cents": UserNetBalance.owed_cents + stmt.excluded.owed_cents,
+    }
+    if mark_dirty:
+        set_["dirty"] = True
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserNetBalance.group_id, UserNetBalance.user_id], set_=set_
+    )
+    db.execute(stmt, rows)
+
+def apply_balance_deltas(
+    db: Session,
+    group_id: int,
+    deltas: dict[tuple[int, int], int],
+    event: Optional[LedgerEventKind] = None,
+    ref_id: Optional[int] = None,
+):
+    """
+    Applies many debt changes within a group at once.
+
+    `deltas` maps (debtor_id, creditor_id) -> cents the debtor additionally owes
+    (negative to reduce the debt). Every pair is written with a single
+    INSERT ... ON CONFLICT DO UPDATE amount_cents = amount_cents + delta, so no rows are read
+    and concurrent writers cannot create duplicate edges. The positions of all
+    touched users are updated the same way, in the same transaction.
+
+    With `event` the change is also appended to the ledger event log; callers
+    that fold several expenses into one call record their own events instead.
+    """
+    pair_deltas = to_pair_deltas(deltas)
+    new_amounts = upsert_pair_deltas(db, group_id, pair_deltas)
+    update_user_positions(db, group_id, pair_deltas, new_amounts)
+    if event is not None:
+        record_ledger_events(db, [ledger_event_row(group_id, event, pair_deltas, ref_id)])
+
+def get_user_position(db: Session, user_id: int) -> dict[str, int]:
+    """
+    Sums a user's materialized positions (cents) across their groups with one indexed aggregate.
+    """
+    row = db.query(
+        func.coalesce(func.sum(UserNetBalance.amount_cents), 0).label("net"),
+        func.coalesce(func.sum(UserNetBalance.owes_cents), 0).label("owes"),
+        func.coalesce(func.sum(UserNetBalance.owed_cents), 0).label("owed"),
+    ).filter(UserNetBalance.user_id == user_id).one()
+    return {"net": int(row.net), "owes": int(row.owes), "owed": int(row.owed)}
+
+def check_user_positions(db: Session, repair: bool = False) -> list[dict]:
+    """
+    Consistency checker: recomputes every (group, user) net and gross total from
+    the pair ledger and compares them with UserNetBalance.
+    Returns one entry per mismatching row. With `repair=True` the stored rows
+    are overwritten with the ledger values (the caller commits).
+    """
+    sides = union_all(
+        select(
+            PairBalance.group_id,
+            PairBalance.user_a_id.label("user_id"),
+            (-PairBalance.amount_cents).label("amount"),
+            case((PairBalance.amount_cents > 0, PairBalance.amount_cents), else_=0).label("owes"),
+            case((PairBalance.amount_cents < 0, -PairBalance.amount_cents), else_=0).label("owed"),
+        ),
+        select(
+            PairBalance.group_id,
+            PairBalance.user_b_id.label("user_id"),
+            PairBalance.amount_cents.label("amount"),
+            case((PairBalance.amount_cents < 0, -PairBalance.amount_cents), else_=0).label("owes"),
+            case((PairBalance.amount_cents > 0, PairBalance.amount_cents), else_=0).label("owed"),
+        ),
+    ).subquery()
+    expected = {
+        (row.group_id, row.user_id): (int(row.amount), int(row.owes), int(row.owed))
+        for row in db.execute(
+            select(
+                sides.c.group_id,
+                sides.c.user_id,
+                func.sum(sides.c.amount).label("amount"),
+                func.sum(sides.c.owes).label("owes"),
+                func.sum(sides.c.owed).label("owed"),
+            ).group_by(sides.c.group_id, sides.c.user_id)
+        )
+    }
+    stored = {(row.group_id, row.user_id): row for row in db.query(UserNetBalance)}
+
+    zero = (0, 0, 0)
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        ledger = expected.get(key, zero)
+        row = stored.get(key)
+        current = (row.amount_cents, row.owes_cents, row.owed_cents) if row else zero
+        if ledger == current:
+            continue
         
-        # Check reverse again just in case
-        if not reverse_edge:
-             reverse_edge = BalanceEdge(from_user_id=to_user, to_user_id=from_user, amount=abs(amount))
-             db.add(reverse_edge)
-        else:
-            reverse_edge.amount = abs(amount)
-            if reverse_edge.amount == 0:
-                db.delete(reverse_edge)
-    else:
-        # amount is 0, remove both
-        if edge: db.delete(edge)
-        if reverse_edge: db.delete(reverse_edge)
+        group_id, user_id = key
+        mismatches.append({"group_id": group_id, "user_id": user_id, "expected": ledger, "stored": current})
+        if repair:
+            if row is None:
+                row = UserNetBalance(group_id=group_id, user_id=user_id, dirty=True)
+                db.add(row)
+            row.amount_cents, row.owes_cents, row.owed_cents = ledger
     
-    db.flush()
+    if repair:
+        db.flush()
+    return mismatches
@@ -0,0 +1,209 @@
+"""
+Bulk expense import from a streamed CSV or NDJSON body.
+
+NDJSON: one ExpenseCreate object per line.
+CSV: a header row with group_id, paid_by_id, amount and splits, where splits
+is a `user_id:amount` list separated by semicolons, e.g. `2:10.00;3:10.00`.
+
+Rows are validated against ExpenseCreate as they arrive and written in chunks:
+one executemany for the expenses, one for their splits, one group version
+bump (taking the groups' ledger locks), one balance upsert per group and one
+executemany for the ledger events, then a commit. Invalid rows are reported and skipped, the rest of
+the file is still imported.
+"""
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.expense import Expense, ExpenseSplit
+from app.models.group import group_members
+from app.models.ledger import LedgerEventKind
+from app.schemas.expense import ExpenseCreate
+from app.services.balances import apply_balance_deltas, to_pair_deltas
+from app.services.groups import bump_group_versions
+from app.services.ledger import ledger_event_row, record_ledger_events
+from app.services.reconciliation import split_deltas
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+CSV_COLUMNS = ("group_id", "paid_by_id", "amount", "splits")
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, row: int, errors: list[str]):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+class ImportAborted(ValueError):
+    """
+    The stream could not be read to the end. Chunks written before the error
+    stay committed, `report` counts their rows.
+    """
+
+    def __init__(self, message: str, report: ImportReport):
+        super().__init__(message)
+        self.report = report
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Re-assembles lines from arbitrary body chunks without buffering the body
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+def _csv_splits(value: str) -> list[dict[str, str]]:
+    splits = []
+    for part in filter(None, (p.strip() for p in value.split(";"))):
+        user_id, sep, amount = part.partition(":")
+        if not sep:
+            raise ValueError(f"Split {part!r} is not user_id:amount")
+        splits.append({"user_id": user_id.strip(), "amount": amount.strip()})
+    return splits
+
+async def parse_rows(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Yields (row number, raw row dict or error message) for every non-empty line.
+    Rows are numbered from 1, not counting the CSV header.
+    """
+    header = None
+    row_number = 0
+    async for line in _lines(stream):
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [column.strip() for column in next(csv.reader([line]))]
+            missing = set(CSV_COLUMNS) - set(header)
+            if missing:
+                raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+            continue
+
+        row_number += 1
+        try:
+            if fmt == "csv":
+                row = dict(zip(header, next(csv.reader([line]))))
+                row["splits"] = _csv_splits(row.get("splits", ""))
+            else:
+                row = json.loads(line)
+        except (ValueError, csv.Error) as e:
+            yield row_number, f"Unparseable row: {e}"
+            continue
+        yield row_number, row
+
+def _validation_message(error: dict) -> str:
+    # Errors of the whole row (e.g. splits not adding up) have no location
+    location = ".".join(str(loc) for loc in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+async def import_expenses(
+    db: AsyncSession, user_id: int, rows: AsyncIterator[tuple[int, Any]], chunk_size: int = IMPORT_CHUNK_SIZE
+) -> ImportReport:
+    """
+    Validates and writes streamed rows for `user_id`, who must be a member of
+    every group they import into, as must each expense's payer and split users.
+    Raises ImportAborted when the stream fails part way.
+    """
+    report = ImportReport()
+    chunk: list[tuple[int, ExpenseCreate]] = []
+    try:
+        async for row_number, row in rows:
+            if isinstance(row, str):
+                report.reject(row_number, [row])
+                continue
+            try:
+                chunk.append((row_number, ExpenseCreate.model_validate(row)))
+            except ValidationError as e:
+                report.reject(row_number, [_validation_message(error) for error in e.errors()])
+                continue
+            if len(chunk) >= chunk_size:
+                await _write_chunk(db, user_id, chunk, report)
+                chunk = []
+    except ValueError as e:
+        # E.g. a bad header or undecodable bytes, the rows after it are lost
+        raise ImportAborted(str(e), report) from e
+    if chunk:
+        await _write_chunk(db, user_id, chunk, report)
+    # Database checks run per chunk, after the parse errors of later rows
+    report.errors.sort(key=lambda error: error["row"])
+    return report
+
+async def _write_chunk(db: AsyncSession, user_id: int, chunk: list[tuple[int, ExpenseCreate]], report: ImportReport):
+    # Memberships of the importer, payers and split users in the referenced
+    # groups are read with one query, so the inserts below cannot fail half
+    # way through on a foreign key and no one is charged outside their group
+    group_ids = {expense.group_id for _, expense in chunk}
+    user_ids = {user_id, *(expense.paid_by_id for _, expense in chunk)}
+    user_ids.update(split.user_id for _, expense in chunk for split in expense.splits)
+
+    memberships = set((await db.execute(
+        select(group_members.c.group_id, group_members.c.user_id).where(
+            group_members.c.group_id.in_(group_ids), group_members.c.user_id.in_(user_ids)
+        )
+    )).tuples())
+
+    valid = []
+    for row_number, expense in chunk:
+        errors = []
+        if (expense.group_id, user_id) not in memberships:
+            errors.append(f"group_id: Not a member of group {expense.group_id}")
+        else:
+            involved = {expense.paid_by_id, *(split.user_id for split in expense.splits)}
+            outsiders = {u for u in involved if (expense.group_id, u) not in memberships}
+            if outsiders:
+                errors.append(f"Not members of group {expense.group_id}: {', '.join(str(u) for u in sorted(outsiders))}")
+        if errors:
+            report.reject(row_number, errors)
+        else:
+            valid.append(expense)
+    if not valid:
+        return
+
+    result = await db.execute(
+        insert(Expense).returning(Expense.id, sort_by_parameter_order=True),
+        [{"group_id": e.group_id, "paid_by_id": e.paid_by_id, "amount_cents": e.amount_cents} for e in valid],
+    )
+    expense_ids = result.scalars().all()
+
+    split_rows = [
+        {"expense_id": expense_id, "user_id": split.user_id, "amount_cents": split.amount_cents}
+        for expense_id, expense in zip(expense_ids, valid)
+        for split in expense.splits
+    ]
+    if split_rows:
+        await db.execute(insert(ExpenseSplit), split_rows)
+
+    # The whole chunk's debt changes, folded into one upsert per group,
+    # while the event log keeps one event per expense
+    deltas_by_group = defaultdict(lambda: defaultdict(int))
+    events = []
+    for expense_id, expense in zip(expense_ids, valid):
+        expense_deltas = split_deltas(expense.paid_by_id, expense.splits)
+        group_deltas = deltas_by_group[expense.group_id]
+        for pair, cents in expense_deltas.items():
+            group_deltas[pair] += cents
+        events.append(ledger_event_row(
+            expense.group_id, LedgerEventKind.EXPENSE_POSTED, to_pair_deltas(expense_deltas), expense_id,
+        ))
+    # The version bump takes the groups' ledger locks first
+    await db.execute(bump_group_versions(deltas_by_group.keys()))
+    await db.run_sync(_apply_chunk_deltas, deltas_by_group, events)
+
+    await db.commit()
+    report.imported += len(valid)
+
+def _apply_chunk_deltas(db, deltas_by_group: dict[int, dict[tuple[int, int], int]], events: list):
+    for group_id, deltas in deltas_by_group.items():
+        apply_balance_deltas(db, group_id, deltas)
+    record_ledger_events(db, events)
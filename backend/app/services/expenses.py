@@ -0,0 +1,72 @@
+from typing import Any, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from app.db.pagination import Cursor, keyset, page
+from app.models.expense import Expense, ExpenseSplit
+from app.models.ledger import LedgerEventKind
+from app.schemas.expense import ExpenseCreate
+from app.services.balances import apply_balance_deltas
+from app.services.groups import bump_group_versions, get_members_among
+from app.services.reconciliation import split_deltas
+
+class ExpenseRejected(ValueError):
+    """
+    The expense cannot be recorded, the message says why.
+    """
+
+async def create_expense(db: AsyncSession, expense_in: ExpenseCreate, user_id: int) -> Expense:
+    """
+    Records an expense, its splits and their balance effects in one transaction.
+    Seven statements and a single commit, whatever the split count.
+
+    The creating user, the payer and every split user must be members of the
+    expense's group, so no one is charged in a group they do not belong to.
+    """
+    involved = {user_id, expense_in.paid_by_id, *(split.user_id for split in expense_in.splits)}
+    members = await get_members_among(db, expense_in.group_id, involved)
+    if members is None:
+        raise ExpenseRejected(f"Group {expense_in.group_id} does not exist")
+    outsiders = involved - members
+    if outsiders:
+        raise ExpenseRejected(f"Not members of group {expense_in.group_id}: {', '.join(str(u) for u in sorted(outsiders))}")
+
+    # Create Expense, id and created_at come back through INSERT ... RETURNING
+    expense = Expense(
+        group_id=expense_in.group_id,
+        paid_by_id=expense_in.paid_by_id,
+        amount_cents=expense_in.amount_cents
+    )
+    db.add(expense)
+    await db.flush()
+    
+    # Create Splits with one executemany
+    if expense_in.splits:
+        await db.execute(insert(ExpenseSplit), [
+            {"expense_id": expense.id, "user_id": split_in.user_id, "amount_cents": split_in.amount_cents}
+            for split_in in expense_in.splits
+        ])
+    
+    # Reconcile balances from the request itself (Expenses create debts),
+    # nothing is read back. The version bump takes the group's ledger lock first.
+    await db.execute(bump_group_versions([expense_in.group_id]))
+    deltas = split_deltas(expense_in.paid_by_id, expense_in.splits)
+    await db.run_sync(
+        apply_balance_deltas, expense_in.group_id, deltas,
+        event=LedgerEventKind.EXPENSE_POSTED, ref_id=expense.id,
+    )
+    
+    await db.commit()
+    return expense
+
+async def list_group_expenses(db: AsyncSession, group_id: int, cursor: Optional[Cursor], limit: int) -> dict[str, Any]:
+    """
+    One page of a group's expenses, newest first, with payers, splits and split users.
+    Two statements per page, served by ix_expense_group_created.
+    """
+    stmt = select(Expense).where(Expense.group_id == group_id).options(
+        joinedload(Expense.paid_by),
+        selectinload(Expense.splits).joinedload(ExpenseSplit.user),
+    )
+    result = await db.execute(keyset(stmt, Expense.created_at, Expense.id, cursor, limit))
+    return page(result.scalars().all(), limit)
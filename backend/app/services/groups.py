@@ -0,0 +1,59 @@
+from typing import Iterable, Optional
+from sqlalchemy import Select, Update, and_, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.group import Group, group_members
+
+async def get_membership(db: AsyncSession, group_id: int, user_id: int) -> tuple[bool, bool]:
+    """
+    Returns (group exists, user is a member) with one statement: two EXISTS
+    probes, on the group primary key and the (user_id, group_id) primary key
+    of group_members. No member rows are loaded.
+    """
+    result = await db.execute(select(
+        exists().where(Group.id == group_id),
+        exists().where(group_members.c.user_id == user_id, group_members.c.group_id == group_id),
+    ))
+    group_exists, is_member = result.one()
+    return bool(group_exists), bool(is_member)
+
+async def get_members_among(db: AsyncSession, group_id: int, user_ids: Iterable[int]) -> Optional[set[int]]:
+    """
+    Which of `user_ids` are members of the group, None if the group does not
+    exist. One statement: the group row outer joined to the matching members.
+    """
+    result = await db.execute(
+        select(group_members.c.user_id).select_from(Group).outerjoin(group_members, and_(
+            group_members.c.group_id == Group.id, group_members.c.user_id.in_(set(user_ids))
+        )).where(Group.id == group_id)
+    )
+    rows = result.scalars().all()
+    if not rows:
+        return None
+    return {user_id for user_id in rows if user_id is not None}
+
+async def get_group_version(db: AsyncSession, group_id: int) -> int:
+    """
+    The group's current version, one primary key lookup.
+    """
+    result = await db.execute(select(Group.version).where(Group.id == group_id))
+    return result.scalar_one()
+
+def bump_group_versions(group_ids: Iterable[int]) -> Update:
+    """
+    UPDATE statement moving the given groups to a new version, for the writer
+    to execute (sync or async) in the transaction that changes them.
+
+    Ledger writers execute it before touching any balance row: the group row
+    lock it takes is the per-group ledger lock, held until commit, so writers
+    and simplify_debts (see lock_group) never interleave within a group.
+    """
+    return update(Group).where(Group.id.in_(sorted(set(group_ids)))).values(
+        version=Group.version + 1
+    ).execution_options(synchronize_session=False)
+
+def lock_group(group_id: int) -> Select:
+    """
+    SELECT ... FOR UPDATE of the group row, the ledger lock taken by writers
+    through bump_group_versions, for readers that must see a stable ledger.
+    """
+    return select(Group.id).where(Group.id == group_id).with_for_update()
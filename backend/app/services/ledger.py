@@ -0,0 +1,195 @@
+"""
+Ledger event log: every change to a group's pair ledger is appended as an event,
+and snapshots fold the events periodically.
+
+A group's balances at any point are the latest snapshot taken at or before it
+plus the events that follow, which serves point-in-time queries ("what did I
+owe on date X") and rebuilding PairBalance / UserNetBalance from scratch.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.orm import Session
+from app.models.balance import PairBalance, UserNetBalance
+from app.models.group import group_members
+from app.models.ledger import BalanceSnapshot, LedgerEvent, LedgerEventKind
+from app.services.groups import lock_group
+
+Pairs = dict[tuple[int, int], int] # canonical pair -> signed cents
+
+class LedgerHistoryUnavailable(ValueError):
+    """
+    The requested time predates the event log for this group (only its
+    baseline snapshot, taken when the log was introduced, is known).
+    """
+
+def encode_pairs(pairs: Pairs) -> list[list]:
+    return [[user_a, user_b, amount] for (user_a, user_b), amount in sorted(pairs.items()) if amount != 0]
+
+def decode_pairs(rows: Iterable[list], into: Optional[Pairs] = None) -> Pairs:
+    pairs = into if into is not None else defaultdict(int)
+    for user_a, user_b, amount in rows:
+        pairs[(user_a, user_b)] += amount
+    return pairs
+
+def ledger_event_row(group_id: int, kind: LedgerEventKind, pair_deltas: Pairs, ref_id: Optional[int] = None) -> Optional[dict]:
+    """
+    The LedgerEvent insert row for a set of canonical pair deltas, None if nothing changes.
+    """
+    deltas = encode_pairs(pair_deltas)
+    if not deltas:
+        return None
+    return {"group_id": group_id, "kind": kind, "ref_id": ref_id, "deltas": deltas}
+
+def record_ledger_events(db: Session, rows: list[Optional[dict]]):
+    """
+    Appends events with one executemany, in the caller's transaction so an
+    event exists exactly when its balance change does.
+    """
+    rows = [row for row in rows if row is not None]
+    if rows:
+        db.execute(insert(LedgerEvent), rows)
+
+def _latest_snapshot(db: Session, group_id: int, at: Optional[datetime] = None) -> Optional[BalanceSnapshot]:
+    stmt = select(BalanceSnapshot).where(BalanceSnapshot.group_id == group_id)
+    if at is not None:
+        stmt = stmt.where(BalanceSnapshot.as_of <= at)
+    return db.execute(stmt.order_by(BalanceSnapshot.last_event_id.desc()).limit(1)).scalars().first()
+
+def group_pairs_at(db: Session, group_id: int, at: Optional[datetime] = None) -> Pairs:
+    """
+    A group's non-zero pair balances as of `at` (now when None): the latest
+    snapshot covering `at` plus the events after it, two statements.
+    Raises LedgerHistoryUnavailable when `at` predates the group's baseline.
+    """
+    snapshot = _latest_snapshot(db, group_id, at)
+    if snapshot is None and at is not None:
+        has_baseline = db.execute(select(exists().where(
+            BalanceSnapshot.group_id == group_id, BalanceSnapshot.last_event_id == 0
+        ))).scalar()
+        if has_baseline:
+            raise LedgerHistoryUnavailable(f"No ledger history for group {group_id} at {at.isoformat()}")
+
+    pairs = decode_pairs(snapshot.pairs) if snapshot else defaultdict(int)
+    stmt = select(LedgerEvent.deltas).where(
+        LedgerEvent.group_id == group_id,
+        LedgerEvent.id > (snapshot.last_event_id if snapshot else 0),
+    )
+    if at is not None:
+        stmt = stmt.where(LedgerEvent.created_at <= at)
+    for deltas in db.execute(stmt.order_by(LedgerEvent.id)).scalars():
+        decode_pairs(deltas, pairs)
+    return {pair: amount for pair, amount in pairs.items() if amount != 0}
+
+def positions_from_pairs(pairs: Pairs) -> dict[int, dict[str, int]]:
+    """
+    Net and gross totals per user, as kept in UserNetBalance.
+    """
+    positions = defaultdict(lambda: {"net": 0, "owes": 0, "owed": 0})
+    for (user_a, user_b), amount in pairs.items():
+        debtor, creditor = (user_a, user_b) if amount > 0 else (user_b, user_a)
+        positions[debtor]["net"] -= abs(amount)
+        positions[debtor]["owes"] += abs(amount)
+        positions[creditor]["net"] += abs(amount)
+        positions[creditor]["owed"] += abs(amount)
+    return positions
+
+def user_position_at(db: Session, user_id: int, at: datetime) -> dict[str, int]:
+    """
+    A user's totals (cents) across their groups as of `at`, replayed per group.
+    """
+    total = {"net": 0, "owes": 0, "owed": 0}
+    group_ids = db.execute(select(group_members.c.group_id).where(group_members.c.user_id == user_id)).scalars().all()
+    for group_id in group_ids:
+        position = positions_from_pairs(group_pairs_at(db, group_id, at)).get(user_id)
+        if position:
+            for key in total:
+                total[key] += position[key]
+    return total
+
+def take_snapshot(db: Session, group_id: int) -> Optional[BalanceSnapshot]:
+    """
+    Folds a group's events into a new snapshot (the caller commits).
+
+    Events are ordered by id, but an id is allocated before its transaction
+    commits, so a committed event could otherwise land behind the snapshot.
+    Every ledger writer inserts its events while holding the group's ledger
+    lock (see bump_group_versions), so the lock is taken first: once it is
+    granted no writer of this group is in flight, and events it lets through
+    later get higher ids than any read here.
+    Returns None when there is nothing new to fold.
+    """
+    db.execute(lock_group(group_id))
+    previous = _latest_snapshot(db, group_id)
+    after = previous.last_event_id if previous else 0
+
+    pairs = decode_pairs(previous.pairs) if previous else defaultdict(int)
+    as_of = previous.as_of if previous else None
+    last_event_id = None
+    for event in db.execute(select(LedgerEvent.id, LedgerEvent.deltas, LedgerEvent.created_at).where(
+        LedgerEvent.group_id == group_id, LedgerEvent.id > after
+    ).order_by(LedgerEvent.id)):
+        decode_pairs(event.deltas, pairs)
+        last_event_id = event.id
+        if as_of is None or event.created_at > as_of:
+            as_of = event.created_at
+    if last_event_id is None:
+        return None
+
+    snapshot = BalanceSnapshot(group_id=group_id, last_event_id=last_event_id, as_of=as_of, pairs=encode_pairs(pairs))
+    db.add(snapshot)
+    db.flush()
+    return snapshot
+
+def snapshot_ledgers(db: Session) -> int:
+    """
+    Snapshots every group with events beyond its latest snapshot, committing
+    each one so a group's ledger lock is only held while it is folded.
+    Returns the number of snapshots taken.
+    """
+    latest = select(
+        BalanceSnapshot.group_id, func.max(BalanceSnapshot.last_event_id).label("last_event_id")
+    ).group_by(BalanceSnapshot.group_id).subquery()
+    group_ids = db.execute(
+        select(LedgerEvent.group_id).outerjoin(latest, latest.c.group_id == LedgerEvent.group_id).where(
+            LedgerEvent.id > func.coalesce(latest.c.last_event_id, 0)
+        ).distinct()
+    ).scalars().all()
+    # Read the list in its own transaction, the locks are taken per group
+    db.commit()
+
+    taken = 0
+    for group_id in sorted(group_ids):
+        if take_snapshot(db, group_id) is not None:
+            taken += 1
+        db.commit()
+    return taken
+
+def stored_group_pairs(db: Session, group_id: int) -> Pairs:
+    return {
+        (row.user_a_id, row.user_b_id): row.amount_cents
+        for row in db.execute(select(PairBalance.user_a_id, PairBalance.user_b_id, PairBalance.amount_cents).where(
+            PairBalance.group_id == group_id, PairBalance.amount_cents != 0
+        ))
+    }
+
+def rebuild_group_balances(db: Session, group_id: int) -> Pairs:
+    """
+    Replaces a group's PairBalance and UserNetBalance rows with the replayed
+    ledger (the caller commits). Returns the replayed pairs.
+    """
+    db.execute(lock_group(group_id))
+    pairs = group_pairs_at(db, group_id)
+    db.execute(delete(UserNetBalance).where(UserNetBalance.group_id == group_id))
+    db.execute(delete(PairBalance).where(PairBalance.group_id == group_id))
+    if pairs:
+        db.execute(insert(PairBalance), [
+            {"group_id": group_id, "user_a_id": user_a, "user_b_id": user_b, "amount_cents": amount}
+            for (user_a, user_b), amount in pairs.items()
+        ])
+        db.execute(insert(UserNetBalance), [
+            {"group_id": group_id, "user_id": user_id, "amount_cents": p["net"], "owes_cents": p["owes"], "owed_cents": p["owed"], "dirty": False}
+            for user_id, p in positions_from_pairs(pairs).items()
+        ])
+    return pairs
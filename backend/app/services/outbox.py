@@ -0,0 +1,73 @@
+"""
+Transactional outbox: messages for the broker are written in the same
+transaction as the change that causes them, and published by a relay after
+the commit. A failed publish is retried on the next relay run instead of
+being lost, and the API never waits on the broker.
+
+Publishing is at-least-once (a relay can die between publishing and marking
+a batch), so consumers must tolerate repeats.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.db.upsert import dialect_insert
+from app.models.outbox import OutboxMessage
+
+# Confirmed payment ids, bound for the on-chain settlement batches
+SETTLEMENT_TOPIC = "settlement"
+
+# topic -> callable publishing the keys and payloads of a batch of messages
+Publisher = Callable[[list[str], list[Any]], None]
+
+def enqueue(db: Session, topic: str, key: str, payload: Optional[Any] = None):
+    """
+    Adds a message to the outbox in the caller's transaction.
+    A message with the same topic and key is only stored once.
+    """
+    stmt = dialect_insert(db, OutboxMessage).values(topic=topic, key=key, payload=payload)
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[OutboxMessage.topic, OutboxMessage.key]))
+
+def relay_batch(db: Session, publishers: dict[str, Publisher], limit: int) -> int:
+    """
+    Publishes up to `limit` pending messages, oldest first, with one publisher
+    call per topic, then marks them dispatched and commits.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so concurrent relays take
+    disjoint batches. If a publisher raises, the transaction is rolled back
+    and the batch stays pending. Returns the number of messages relayed.
+    """
+    messages = db.execute(
+        select(OutboxMessage).where(OutboxMessage.dispatched_at.is_(None))
+        .order_by(OutboxMessage.id).limit(limit).with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not messages:
+        db.rollback()
+        return 0
+
+    try:
+        by_topic: dict[str, list[OutboxMessage]] = {}
+        for message in messages:
+            by_topic.setdefault(message.topic, []).append(message)
+        for topic, batch in by_topic.items():
+            if topic not in publishers:
+                raise ValueError(f"No publisher for outbox topic {topic!r}")
+            publishers[topic]([m.key for m in batch], [m.payload for m in batch])
+
+        db.execute(
+            update(OutboxMessage).where(OutboxMessage.id.in_([m.id for m in messages]))
+            .values(dispatched_at=datetime.now(timezone.utc))
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(messages)
+
+def prune_dispatched(db: Session, retention_seconds: int) -> int:
+    """
+    Deletes messages dispatched more than `retention_seconds` ago (the caller commits).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+    result = db.execute(delete(OutboxMessage).where(OutboxMessage.dispatched_at < cutoff))
+    return result.rowcount
@@ -1,47 +1,103 @@
-from sqlalchemy.orm import Session
+from typing import Any, Optional
+from sqlalchemy import select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.pagination import Cursor, keyset, page
 from app.models.payment import Payment, PaymentStatus, PaymentMethod
 from app.schemas.payment import PaymentCreate
+from app.services.groups import get_members_among
+from app.services.outbox import SETTLEMENT_TOPIC, enqueue
 from app.services.reconciliation import reconcile_payment
-from app.workers.settlement_writer import write_settlement_to_blockchain
 
-def create_payment(db: Session, payment_in: PaymentCreate) -> Payment:
+class PaymentRejected(ValueError):
+    """
+    The payment cannot be recorded or confirmed, the message says why.
+    """
+
+async def create_payment(db: AsyncSession, payment_in: PaymentCreate) -> Payment:
+    # Balances are group scoped: both sides must belong to the payment's group
+    if payment_in.from_user_id == payment_in.to_user_id:
+        raise PaymentRejected("A payment needs two different users")
+    members = await get_members_among(db, payment_in.group_id, (payment_in.from_user_id, payment_in.to_user_id))
+    if members is None:
+        raise PaymentRejected(f"Group {payment_in.group_id} does not exist")
+    outsiders = {payment_in.from_user_id, payment_in.to_user_id} - members
+    if outsiders:
+        raise PaymentRejected(f"Not members of group {payment_in.group_id}: {', '.join(str(u) for u in sorted(outsiders))}")
+
     payment = Payment(
+        group_id=payment_in.group_id,
         from_user_id=payment_in.from_user_id,
         to_user_id=payment_in.to_user_id,
-        amount=payment_in.amount,
+        amount_cents=payment_in.amount_cents,
         status=PaymentStatus.PENDING,
         method=payment_in.method
     )
     db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    await db.commit()
+    await db.refresh(payment)
     
     # Logic: If In-App, we simulate auto-confirmation
     if payment.method == PaymentMethod.IN_APP:
         # In a real app, this would happen after Stripe/Crypto webhook callback
         # For now, we simulate instant success
-        confirm_payment(db, payment.id)
-        db.refresh(payment)
+        await confirm_payment(db, payment.id)
+        await db.refresh(payment)
         
     return payment
 
-def confirm_payment(db: Session, payment_id: int) -> Payment | None:
-    payment = db.query(Payment).filter(Payment.id == payment_id).first()
+async def confirm_payment(db: AsyncSession, payment_id: int) -> Payment | None:
+    payment = await db.get(Payment, payment_id)
     if not payment:
         return None
         
     if payment.status != PaymentStatus.PENDING:
         return payment # Already confirmed or rejected
+    if payment.group_id is None:
+        # Legacy payment between users who share no group, there is no ledger to apply it to
+        raise PaymentRejected(f"Payment {payment.id} belongs to no group and cannot be confirmed")
         
-    payment.status = PaymentStatus.CONFIRMED
+    # Only the request that moves it out of PENDING applies it, a concurrent
+    # confirmation finds no pending row and leaves the ledger alone
+    claimed = await db.execute(
+        update(Payment).where(
+            Payment.id == payment_id, Payment.status == PaymentStatus.PENDING
+        ).values(status=PaymentStatus.CONFIRMED)
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        await db.refresh(payment)
+        return payment
     
-    # Reconcile balances
-    reconcile_payment(db, payment)
+    # Reconcile balances, the ledger code is shared with the sync workers
+    await db.run_sync(reconcile_payment, payment)
     
-    db.commit()
-    db.refresh(payment)
+    # Settlement writing is requested through the outbox, committed together
+    # with the confirmation. The relay publishes it, the broker is not called here.
+    await db.run_sync(enqueue, SETTLEMENT_TOPIC, str(payment.id))
     
-    # Trigger async settlement writing
-    write_settlement_to_blockchain.delay(payment.id)
+    await db.commit()
+    await db.refresh(payment)
     
     return payment
+
+async def list_user_payments(db: AsyncSession, user_id: int, cursor: Optional[Cursor], limit: int) -> dict[str, Any]:
+    """
+    One page of the payments a user sent or received, newest first.
+
+    Each side is read from its own (user, created_at, id) index and cut to the
+    page size before the two are merged, so the cost does not grow with the
+    user's payment history.
+    """
+    sent = keyset(
+        select(Payment.id, Payment.created_at).where(Payment.from_user_id == user_id),
+        Payment.created_at, Payment.id, cursor, limit
+    ).subquery()
+    received = keyset(
+        select(Payment.id, Payment.created_at).where(Payment.to_user_id == user_id),
+        Payment.created_at, Payment.id, cursor, limit
+    ).subquery()
+    ids = union(select(sent.c.id), select(received.c.id)).subquery()
+
+    stmt = select(Payment).join(ids, Payment.id == ids.c.id)
+    result = await db.execute(keyset(stmt, Payment.created_at, Payment.id, None, limit))
+    return page(result.scalars().all(), limit)
@@ -1,9 +1,14 @@
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from app.models.payment import Payment
 from app.models.expense import Expense
-from app.models.balance import BalanceEdge
-from app.services.balances import get_balance_edge, update_balance
-from decimal import Decimal
+from app.models.balance import PairBalance, UserNetBalance
+from app.models.ledger import LedgerEventKind
+from app.services.groups import bump_group_versions, lock_group
+from app.services.balances import apply_balance_deltas, to_pair_deltas, upsert_pair_deltas, update_user_positions
+from app.services.ledger import ledger_event_row, record_ledger_events
+from app.services.settlement_solver import SettlementPlan, solve
+from collections import defaultdict
 
 def reconcile_payment(db: Session, payment: Payment):
     """
@@ -11,23 +16,12 @@ def reconcile_payment(db: Session, payment: Payment):
     Payer (from_user) pays Receiver (to_user).
     Effect: Payer's debt to Receiver decreases.
     """
-    payer_id = payment.from_user_id
-    receiver_id = payment.to_user_id
-    amount = payment.amount
-    
-    # Get current debt P -> R
-    edge_p_r = get_balance_edge(db, payer_id, receiver_id)
-    edge_r_p = get_balance_edge(db, receiver_id, payer_id)
-    
-    current_debt_p_to_r = 0
-    if edge_p_r:
-        current_debt_p_to_r = edge_p_r.amount
-    elif edge_r_p:
-        current_debt_p_to_r = -edge_r_p.amount
-        
-    new_debt_p_to_r = current_debt_p_to_r - amount
-    
-    update_balance(db, payer_id, receiver_id, new_debt_p_to_r)
+    # The version bump takes the group's ledger lock, before any balance row
+    db.execute(bump_group_versions([payment.group_id]))
+    apply_balance_deltas(
+        db, payment.group_id, {(payment.from_user_id, payment.to_user_id): -payment.amount_cents},
+        event=LedgerEventKind.PAYMENT_CONFIRMED, ref_id=payment.id,
+    )
 
 def reconcile_expense(db: Session, expense: Expense):
     """
@@ -35,113 +29,130 @@ def reconcile_expense(db: Session, expense: Expense):
     Payer pays for the group.
     Each member in splits owes Payer their share.
     """
-    payer_id = expense.paid_by_id
+    deltas = split_deltas(expense.paid_by_id, expense.splits)
     
-    for split in expense.splits:
+    # The version bump takes the group's ledger lock, then one bulk write
+    # for all splits, regardless of split count
+    db.execute(bump_group_versions([expense.group_id]))
+    apply_balance_deltas(db, expense.group_id, deltas, event=LedgerEventKind.EXPENSE_POSTED, ref_id=expense.id)
+
+def split_deltas(payer_id: int, splits, deltas: dict | None = None) -> dict[tuple[int, int], int]:
+    """
+    Debt changes (cents) caused by one expense: every split's user owes the payer their share.
+    `splits` are ExpenseSplit rows or ExpenseSplitCreate items. Accumulates into
+    `deltas` when given, so many expenses can be folded into one write.
+    """
+    if deltas is None:
+        deltas = defaultdict(int)
+    for split in splits:
         if split.user_id == payer_id:
             continue
-            
-        debtor_id = split.user_id
-        amount = split.amount
-        
-        # Debtor owes Payer amount.
-        # Increase debt Debtor -> Payer.
-        
-        edge_d_p = get_balance_edge(db, debtor_id, payer_id)
-        edge_p_d = get_balance_edge(db, payer_id, debtor_id)
-        
-        current_debt_d_to_p = 0
-        if edge_d_p:
-            current_debt_d_to_p = edge_d_p.amount
-        elif edge_p_d:
-            current_debt_d_to_p = -edge_p_d.amount
-            
-        new_debt_d_to_p = current_debt_d_to_p + amount
-        
-        update_balance(db, debtor_id, payer_id, new_debt_d_to_p)
+        # Debtor owes Payer their share
+        deltas[(split.user_id, payer_id)] += split.amount_cents
+    return deltas
 
-def simplify_debts(db: Session, group_id: int | None = None):
+def _load_touched_components(db: Session, group_id: int) -> tuple[set[int], list[PairBalance]]:
     """
-    Debt Simplification Algorithm.
-    
-    Args:
-        group_id: If provided, only simplifies debts within that group.
-                  If None, performs Global Simplification across all groups.
+    Collects every user of a group connected (through non-zero balances) to a user
+    whose debts changed since the last run, together with the edges between them.
+    Cost is proportional to the size of the touched components, not the ledger.
     """
-    # 1. Calculate Net Balances
-    net_balances = {}
-    
-    # Filter edges based on scope
-    query = db.query(BalanceEdge)
-    
-    # NOTE: In a real production app with "Scoped" simplification, 
-    # we would need a way to link BalanceEdges to specific Groups.
-    # Currently, BalanceEdge is user-to-user (agnostic of group).
-    # To support TRUE single-group simplification, we would need to:
-    # A) Add 'group_id' to BalanceEdge (making debts group-specific)
-    # B) OR, calculate net balances dynamically from Expenses of that group only.
-    
-    # For this implementation, we will use Method B (Dynamic Calculation from Expenses)
-    # This is safer because it doesn't mess up the global ledger permanently.
-    
-    if group_id:
-        # Calculate what the balances SHOULD be for just this group
-        # This is complex because BalanceEdge stores the *current state* of everything.
-        # If we want to simplify just one group, we actually need to look at Expenses.
-        pass 
-        # For now, let's stick to the Global logic but we can filter users if needed.
-        # A simple heuristic: Only include users who are members of group_id.
-    
-    edges = query.all()
-    
-    # ... (Rest of the logic is the same, but we can filter users)
-    
-    for edge in edges:
-        # Debtor (from_user) loses money (negative net)
-        net_balances[edge.from_user_id] = net_balances.get(edge.from_user_id, Decimal(0)) - edge.amount
-        # Creditor (to_user) gains money (positive net)
-        net_balances[edge.to_user_id] = net_balances.get(edge.to_user_id, Decimal(0)) + edge.amount
-            
-    # 2. Separate into Debtors and Creditors
-    debtors = []
-    creditors = []
-    
-    for user_id, amount in net_balances.items():
-        if amount < -0.01: # Tolerance for float math
-            debtors.append({"id": user_id, "amount": amount})
-        elif amount > 0.01:
-            creditors.append({"id": user_id, "amount": amount})
-            
-    # Sort by magnitude (Greedy approach: Match biggest debts first)
-    debtors.sort(key=lambda x: x["amount"])      # Ascending (e.g. -100, -50)
-    creditors.sort(key=lambda x: x["amount"], reverse=True) # Descending (e.g. 100, 50)
+    dirty_ids = {
+        row.user_id for row in db.query(UserNetBalance.user_id).filter(
+            UserNetBalance.group_id == group_id,
+            UserNetBalance.dirty.is_(True)
+        )
+    }
+    users = set(dirty_ids)
+    edges = {}
+    frontier = dirty_ids
+    
+    # Breadth-first walk, one query per hop
+    while frontier:
+        hop = db.query(PairBalance).filter(
+            PairBalance.group_id == group_id,
+            PairBalance.amount_cents != 0,
+            or_(PairBalance.user_a_id.in_(frontier), PairBalance.user_b_id.in_(frontier))
+        ).all()
+        frontier = set()
+        for edge in hop:
+            edges[edge.id] = edge
+            for user_id in (edge.user_a_id, edge.user_b_id):
+                if user_id not in users:
+                    users.add(user_id)
+                    frontier.add(user_id)
+    
+    return users, list(edges.values())
+
+def simplify_debts(db: Session, group_id: int | None = None, strategy: str = "auto") -> dict[int, SettlementPlan]:
+    """
+    Incremental Debt Simplification.
     
-    # 3. Wipe the Board
-    db.query(BalanceEdge).delete()
-    db.flush()
+    Only the connected components that contain a user flagged as dirty
+    (by apply_balance_deltas) are recomputed. Their edges are rewritten as
+    deltas against the current state, so untouched rows are never locked.
     
-    # 4. Reconstruct Graph (Greedy Matching)
-    i = 0 # Debtor index
-    j = 0 # Creditor index
+    Args:
+        group_id: If provided, only simplifies debts within that group.
+                  If None, simplifies every group with pending changes.
+        strategy: Settlement solver strategy ("auto", "greedy", "exact", "heuristic").
     
-    while i < len(debtors) and j < len(creditors):
-        debtor = debtors[i]
-        creditor = creditors[j]
-        
-        # The amount to settle is the minimum of what Debtor owes vs what Creditor needs
-        amount = min(abs(debtor["amount"]), creditor["amount"])
-        
-        # Create the simplified edge
-        update_balance(db, debtor["id"], creditor["id"], amount)
-        
-        # Update remaining amounts
-        debtor["amount"] += amount
-        creditor["amount"] -= amount
-        
-        # Move indices if settled
-        if abs(debtor["amount"]) < 0.01:
-            i += 1
-        if creditor["amount"] < 0.01:
-            j += 1
-            
+    Returns the solver plan (transfer count, solve time) of every simplified group.
+    """
+    if group_id is not None:
+        group_ids = [group_id]
+    else:
+        group_ids = [
+            row.group_id for row in db.query(UserNetBalance.group_id).filter(
+                UserNetBalance.dirty.is_(True)
+            ).distinct()
+        ]
+    
+    plans = {}
+    for gid in group_ids:
+        plan = _simplify_group(db, gid, strategy)
+        if plan is not None:
+            plans[gid] = plan
     db.commit()
+    return plans
+
+def _simplify_group(db: Session, group_id: int, strategy: str) -> SettlementPlan | None:
+    # 1. Take the group's ledger lock before reading anything: it waits for
+    # open writers of this group to commit, and holds new ones back until this
+    # run commits, so the edges and nets read below describe the same ledger
+    db.execute(lock_group(group_id))
+    
+    # 2. Find what changed in this group since the last run
+    users, edges = _load_touched_components(db, group_id)
+    if not users:
+        return None
+    
+    # Net positions are maintained on every mutation, no need to sum edges
+    net_rows = db.query(UserNetBalance).filter(
+        UserNetBalance.group_id == group_id,
+        UserNetBalance.user_id.in_(users)
+    ).all()
+    positions = {row.user_id: row.amount_cents for row in net_rows}
+    
+    # 3. Solve with the requested strategy, amounts are already integer cents
+    plan = solve(positions, strategy)
+    simplified = {
+        (debtor_id, creditor_id): cents
+        for debtor_id, creditor_id, cents in plan.transfers
+    }
+    
+    # 4. Rewrite the touched components as deltas: new graph minus current graph.
+    # Nets are unchanged by simplification, only the gross totals shrink.
+    pair_deltas = to_pair_deltas(simplified)
+    for edge in edges:
+        pair_deltas[(edge.user_a_id, edge.user_b_id)] -= edge.amount_cents
+    new_amounts = upsert_pair_deltas(db, group_id, pair_deltas)
+    update_user_positions(db, group_id, pair_deltas, new_amounts, mark_dirty=False)
+    record_ledger_events(db, [ledger_event_row(group_id, LedgerEventKind.SIMPLIFICATION_APPLIED, pair_deltas)])
+    db.execute(bump_group_versions([group_id]))
+    
+    db.query(UserNetBalance).filter(
+        UserNetBalance.group_id == group_id,
+        UserNetBalance.user_id.in_(users)
+    ).update({UserNetBalance.dirty: False}, synchronize_session=False)
+    return plan
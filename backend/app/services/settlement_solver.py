@@ -0,0 +1,176 @@
+"""
+Settlement solver: turns net positions into a list of transfers.
+
+Positions are integer cents (positive: owed money, negative: owes money) and
+must sum to zero. Strategies:
+
+    greedy     Heap-based largest-debtor/largest-creditor matching. O(n log n).
+    exact      Zero-sum subset partitioning. Minimal transfer count, exponential,
+               only used for small groups.
+    heuristic  Bounded-time: cancels exact matches and small zero-sum triples
+               within a time budget, then falls back to greedy.
+    auto       exact for small inputs, heuristic otherwise.
+"""
+import heapq
+import time
+from dataclasses import dataclass, field
+
+EXACT_MAX_PARTIES = 14
+HEURISTIC_TIME_BUDGET = 0.05 # seconds
+
+@dataclass
+class SettlementPlan:
+    strategy: str
+    transfers: list[tuple[int, int, int]] = field(default_factory=list) # (debtor_id, creditor_id, cents)
+    solve_time: float = 0.0
+
+    @property
+    def transfer_count(self) -> int:
+        return len(self.transfers)
+
+def _greedy(ids: list[int], cents: list[int]) -> list[tuple[int, int, int]]:
+    # Max-heaps keyed on magnitude, remainders are pushed back so the
+    # largest open positions are always matched next
+    debtors = [(c, user_id) for user_id, c in zip(ids, cents) if c < 0]
+    creditors = [(-c, user_id) for user_id, c in zip(ids, cents) if c > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, debtor_id = heapq.heappop(debtors)
+        credit, creditor_id = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((debtor_id, creditor_id, amount))
+
+        if debt + amount < 0:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+        if credit + amount < 0:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+    return transfers
+
+def _exact(ids: list[int], cents: list[int]) -> list[tuple[int, int, int]]:
+    # Every zero-sum subset of k parties settles in k - 1 transfers, so the
+    # minimum transfer count is n - (max number of disjoint zero-sum subsets).
+    n = len(cents)
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    best = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + cents[low.bit_length() - 1]
+        m = mask
+        top = 0
+        while m:
+            bit = m & -m
+            if best[mask ^ bit] > top:
+                top = best[mask ^ bit]
+            m ^= bit
+        best[mask] = top + (1 if sums[mask] == 0 else 0)
+
+    # Recover an element order whose zero-sum prefixes delimit the subsets
+    order = []
+    mask = full
+    while mask:
+        target = best[mask] - (1 if sums[mask] == 0 else 0)
+        m = mask
+        while m:
+            bit = m & -m
+            if best[mask ^ bit] == target:
+                order.append(bit.bit_length() - 1)
+                mask ^= bit
+                break
+            m ^= bit
+    order.reverse()
+
+    transfers = []
+    subset = []
+    running = 0
+    for index in order:
+        subset.append(index)
+        running += cents[index]
+        if running == 0:
+            transfers.extend(_greedy([ids[i] for i in subset], [cents[i] for i in subset]))
+            subset = []
+    return transfers
+
+def _heuristic(ids: list[int], cents: list[int], budget: float) -> list[tuple[int, int, int]]:
+    deadline = time.perf_counter() + budget
+    open_positions = {user_id: c for user_id, c in zip(ids, cents) if c != 0}
+    transfers = []
+
+    # 1. A debtor and a creditor with the same magnitude settle in one transfer
+    creditors_by_amount = {}
+    for user_id, c in open_positions.items():
+        if c > 0:
+            creditors_by_amount.setdefault(c, []).append(user_id)
+    for user_id, c in list(open_positions.items()):
+        if c < 0 and creditors_by_amount.get(-c):
+            creditor_id = creditors_by_amount[-c].pop()
+            transfers.append((user_id, creditor_id, -c))
+            del open_positions[user_id]
+            del open_positions[creditor_id]
+
+    # 2. Two parties on one side that exactly cover one party on the other
+    # settle in two transfers instead of three, until the budget runs out
+    def match_triples(side: int):
+        singles = {}
+        for user_id, c in open_positions.items():
+            if c * side < 0:
+                singles.setdefault(-c, []).append(user_id)
+        pool = [(user_id, c) for user_id, c in open_positions.items() if c * side > 0]
+        used = set()
+        for i, (first_id, first) in enumerate(pool):
+            if time.perf_counter() > deadline:
+                return
+            if first_id in used:
+                continue
+            for second_id, second in pool[i + 1:]:
+                if second_id in used:
+                    continue
+                candidates = singles.get(first + second)
+                if not candidates:
+                    continue
+                single_id = candidates.pop()
+                used.update((first_id, second_id, single_id))
+                for party_id, amount in ((first_id, first), (second_id, second)):
+                    if side > 0:
+                        transfers.append((single_id, party_id, amount))
+                    else:
+                        transfers.append((party_id, single_id, -amount))
+                break
+        for user_id in used:
+            del open_positions[user_id]
+
+    match_triples(side=1)
+    match_triples(side=-1)
+
+    # 3. Whatever is left goes through the heap matcher
+    transfers.extend(_greedy(list(open_positions.keys()), list(open_positions.values())))
+    return transfers
+
+def solve(positions: dict[int, int], strategy: str = "auto") -> SettlementPlan:
+    """
+    Computes transfers that settle `positions` (user_id -> net cents).
+    """
+    ids = [user_id for user_id, c in positions.items() if c != 0]
+    cents = [positions[user_id] for user_id in ids]
+    if sum(cents) != 0:
+        raise ValueError("Net positions must sum to zero")
+
+    if strategy == "auto":
+        strategy = "exact" if len(ids) <= EXACT_MAX_PARTIES else "heuristic"
+
+    started = time.perf_counter()
+    if strategy == "greedy":
+        transfers = _greedy(ids, cents)
+    elif strategy == "exact":
+        if len(ids) > EXACT_MAX_PARTIES:
+            raise ValueError(f"Exact strategy supports at most {EXACT_MAX_PARTIES} parties")
+        transfers = _exact(ids, cents)
+    elif strategy == "heuristic":
+        transfers = _heuristic(ids, cents, HEURISTIC_TIME_BUDGET)
+    else:
+        raise ValueError(f"Unknown settlement strategy: {strategy}")
+
+    return SettlementPlan(strategy=strategy, transfers=transfers, solve_time=time.perf_counter() - started)
@@ -0,0 +1,13 @@
+from app.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.services import ledger
+
+@celery_app.task
+def snapshot_ledgers():
+    db = SessionLocal()
+    try:
+        taken = ledger.snapshot_ledgers(db)
+        if taken:
+            print(f"Took {taken} ledger snapshots.")
+    finally:
+        db.close()
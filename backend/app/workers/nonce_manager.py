@@ -0,0 +1,18 @@
+from web3 import Web3
+
+class NonceManager:
+    """
+    Allocates transaction nonces for one account.
+
+    Any worker process may be the one sending, so nothing is cached between
+    sends: a sequence kept by one process goes stale as soon as another
+    process sends. Every allocation reads the node's pending transaction
+    count instead, and callers hold FLUSH_LOCK_KEY while they allocate and
+    broadcast, so the count already includes every earlier transaction.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+
+    def allocate(self, w3: Web3) -> int:
+        return w3.eth.get_transaction_count(self.address, "pending")
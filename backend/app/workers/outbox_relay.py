@@ -0,0 +1,34 @@
+from app.celery_app import celery_app
+from app.config import settings
+from app.db.session import SessionLocal
+from app.services.outbox import SETTLEMENT_TOPIC, prune_dispatched, relay_batch
+from app.workers.settlement_writer import flush_settlement_batch, queue_settlements
+from app.workers.task_metrics import outbox_relayed
+
+# Batches relayed per run, so one run cannot hold a worker indefinitely
+MAX_BATCHES_PER_RUN = 20
+
+def publish_settlements(keys: list[str], payloads: list):
+    # One RPUSH for the whole batch. A payment queued twice is skipped by
+    # _record_batch once it has been submitted.
+    pending = queue_settlements([int(key) for key in keys])
+    if pending >= settings.SETTLEMENT_BATCH_SIZE:
+        flush_settlement_batch.delay()
+
+PUBLISHERS = {
+    SETTLEMENT_TOPIC: publish_settlements,
+}
+
+@celery_app.task
+def relay_outbox():
+    db = SessionLocal()
+    try:
+        for _ in range(MAX_BATCHES_PER_RUN):
+            relayed = relay_batch(db, PUBLISHERS, settings.OUTBOX_RELAY_BATCH_SIZE)
+            outbox_relayed.inc(relayed)
+            if relayed < settings.OUTBOX_RELAY_BATCH_SIZE:
+                break
+        if prune_dispatched(db, settings.OUTBOX_RETENTION):
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import NamedTuple
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from eth_account import Account
+from app.config import settings
+from app.workers.nonce_manager import NonceManager
+
+class SentTransaction(NamedTuple):
+    tx_hash: str
+    nonce: int
+    gas_price: int
+
+class SettlementClient:
+    """
+    Long-lived blockchain client for one worker process.
+
+    Holds a keep-alive HTTP connection pool, the bound settlement contract,
+    the signing account and its nonce allocator, so a task only has to sign
+    and send. Gas price is cached for GAS_PRICE_TTL seconds and node health
+    is checked on a background thread instead of before every task.
+    """
+
+    def __init__(self, abi: list[dict]):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.ETHEREUM_POOL_SIZE,
+            pool_maxsize=settings.ETHEREUM_POOL_SIZE,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        self.w3 = Web3(Web3.HTTPProvider(settings.ETHEREUM_NODE_URL, session=session))
+        self.contract = self.w3.eth.contract(address=settings.SETTLEMENT_CONTRACT_ADDRESS, abi=abi)
+        self.account = Account.from_key(settings.PRIVATE_KEY)
+        self.nonces = NonceManager(self.account.address)
+        self.connected = True
+
+        self._gas_lock = threading.Lock()
+        self._gas_price: int | None = None
+        self._gas_price_at = 0.0
+        self._stop = threading.Event()
+        self._health_thread: threading.Thread | None = None
+
+    def gas_price(self) -> int:
+        with self._gas_lock:
+            now = time.monotonic()
+            if self._gas_price is None or now - self._gas_price_at > settings.GAS_PRICE_TTL:
+                self._gas_price = self.w3.eth.gas_price
+                self._gas_price_at = now
+            return self._gas_price
+
+    def send(self, call, nonce: int | None = None, gas_price: int | None = None) -> SentTransaction:
+        """
+        Builds, signs and broadcasts a contract call.
+        Without a nonce the next one is allocated and the caller must hold
+        FLUSH_LOCK_KEY, see NonceManager. Passing the nonce of a pending
+        transaction replaces it, which needs a higher gas price.
+        """
+        tx = call.build_transaction({
+            'chainId': settings.CHAIN_ID,
+            'from': self.account.address,
+            'gasPrice': gas_price if gas_price is not None else self.gas_price(),
+            'nonce': nonce if nonce is not None else self.nonces.allocate(self.w3),
+        })
+        signed_tx = self.account.sign_transaction(tx)
+        tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+        return SentTransaction(tx_hash, tx['nonce'], tx['gasPrice'])
+
+    def start_health_checks(self):
+        if self._health_thread is not None:
+            return
+        self._health_thread = threading.Thread(target=self._health_loop, name="settlement-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def _health_loop(self):
+        while not self._stop.wait(settings.ETHEREUM_HEALTH_CHECK_INTERVAL):
+            try:
+                self.connected = self.w3.is_connected()
+            except Exception:
+                self.connected = False
+
+_client: SettlementClient | None = None
+_client_lock = threading.Lock()
+
+def init_settlement_client(abi: list[dict]) -> SettlementClient | None:
+    """
+    Creates this process's client. Called on worker process init; returns None
+    when the blockchain is not configured.
+    """
+    global _client
+    with _client_lock:
+        if _client is None and settings.SETTLEMENT_CONTRACT_ADDRESS and settings.PRIVATE_KEY:
+            _client = SettlementClient(abi)
+            _client.start_health_checks()
+        return _client
+
+def get_settlement_client(abi: list[dict]) -> SettlementClient | None:
+    # Falls back to lazy creation for pools that skip worker_process_init (solo, threads)
+    return _client if _client is not None else init_settlement_client(abi)
@@ -1,9 +1,17 @@
 from app.celery_app import celery_app
-from app.db.session import SessionLocal
-from app.models.payment import Payment
+from app.core.redis import PENDING_SETTLEMENTS_KEY, redis_client
+from app.db.session import SessionLocal, engine
+from app.models.payment import Payment, SettlementStatus
+from app.workers.settlement_client import SettlementClient, init_settlement_client, get_settlement_client
+from app.workers.task_metrics import settlement_batch_size, settlement_transactions
+from celery.signals import worker_process_init
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from redis.exceptions import LockNotOwnedError
+from redis.lock import Lock
+from sqlalchemy.orm import Session, joinedload
 from web3 import Web3
 from app.config import settings
-from eth_account import Account
 import json
 
 # Minimal ABI for the settlement contract
@@ -19,73 +27,343 @@ CONTRACT_ABI = [
         "outputs": [],
         "stateMutability": "nonpayable",
         "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "address[]", "name": "_payers", "type": "address[]"},
+            {"internalType": "address[]", "name": "_payees", "type": "address[]"},
+            {"internalType": "uint256[]", "name": "_amounts", "type": "uint256[]"},
+            {"internalType": "bytes32[]", "name": "_settlementHashes", "type": "bytes32[]"}
+        ],
+        "name": "recordSettlements",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "bytes32", "name": "_root", "type": "bytes32"},
+            {"internalType": "uint256", "name": "_count", "type": "uint256"}
+        ],
+        "name": "recordSettlementRoot",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
     }
 ]
 
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    # One pooled client per worker process, built before the first task arrives
+    init_settlement_client(CONTRACT_ABI)
+    # Connections opened before the fork belong to the parent, start with an empty pool
+    engine.dispose(close=False)
+
+# Held by the worker flushing a settlement batch
+FLUSH_LOCK_KEY = "settlements:flush-lock"
+
+def settlement_hash(payer_wallet: str, payee_wallet: str, amount_wei: int, payment_id: int) -> bytes:
+    return Web3.solidity_keccak(
+        ['address', 'address', 'uint256', 'uint256'],
+        [payer_wallet, payee_wallet, amount_wei, payment_id]
+    )
+
+def queue_settlements(payment_ids: list[int]) -> int:
+    """
+    Appends payments to the pending batch queue and returns its new length.
+    """
+    if not payment_ids:
+        return redis_client.llen(PENDING_SETTLEMENTS_KEY)
+    return redis_client.rpush(PENDING_SETTLEMENTS_KEY, *payment_ids)
+
+def merkle_root(leaves: list[bytes]) -> bytes:
+    """
+    Root of a binary Merkle tree over `leaves`, hashing sorted pairs so proofs
+    need no left/right flags (matches verifySettlementProof in the contract).
+    An odd node at the end of a level is promoted unchanged.
+    """
+    level = sorted(leaves)
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level) - 1, 2):
+            a, b = sorted((level[i], level[i + 1]))
+            next_level.append(Web3.keccak(a + b))
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0]
+
 @celery_app.task(acks_late=True, bind=True, max_retries=5)
-def write_settlement_to_blockchain(self, payment_id: int):
-    db = SessionLocal()
+def flush_settlement_batch(self):
+    # One flusher at a time across all workers, so batches never interleave
+    lock = redis_client.lock(FLUSH_LOCK_KEY, timeout=600)
+    if not lock.acquire(blocking=False):
+        return
+
+    payment_ids = []
     try:
-        payment = db.query(Payment).filter(Payment.id == payment_id).first()
-        if not payment:
+        raw_ids = redis_client.lpop(PENDING_SETTLEMENTS_KEY, settings.SETTLEMENT_BATCH_SIZE)
+        if not raw_ids:
             return
+        payment_ids = [int(i) for i in raw_ids]
+
+        _record_batch(payment_ids, lock)
+
+        # More than one batch was waiting
+        if redis_client.llen(PENDING_SETTLEMENTS_KEY) >= settings.SETTLEMENT_BATCH_SIZE:
+            flush_settlement_batch.delay()
+
+    except Exception as e:
+        print(f"Error writing settlement batch: {e}")
+        if payment_ids:
+            # Put the batch back at the head of the queue, in order
+            redis_client.lpush(PENDING_SETTLEMENTS_KEY, *reversed(payment_ids))
+        # Back off exponentially instead of hammering an unhealthy node
+        raise self.retry(exc=e, countdown=min(30 * 2 ** self.request.retries, 900))
+    finally:
+        _release(lock)
 
-        if not settings.SETTLEMENT_CONTRACT_ADDRESS or not settings.PRIVATE_KEY:
-            print("Blockchain not configured, skipping settlement writing.")
+def _release(lock: Lock):
+    # An expired lock raising here would hide the error being handled
+    try:
+        lock.release()
+    except LockNotOwnedError:
+        print(f"{lock.name} expired before it was released")
+
+def _record_batch(payment_ids: list[int], lock: Lock):
+    """
+    Sends one transaction recording the given payments and marks them as submitted.
+    Confirmation is left to poll_settlement_receipts.
+
+    `lock` is the held flush lock. It is renewed right before the send and
+    the send is abandoned if it was lost, so two processes never allocate
+    nonces at the same time.
+    """
+    client = get_settlement_client(CONTRACT_ABI)
+    if client is None:
+        print("Blockchain not configured, skipping settlement writing.")
+        return
+
+    db = SessionLocal()
+    try:
+        payments = db.query(Payment).options(
+            joinedload(Payment.from_user), joinedload(Payment.to_user)
+        ).filter(
+            Payment.id.in_(payment_ids)
+        ).all()
+        # Already on their way, e.g. queued twice
+        payments = [
+            p for p in payments
+            if p.settlement_status not in (SettlementStatus.SUBMITTED, SettlementStatus.CONFIRMED)
+        ]
+
+        call, batch = _settlement_call(client, payments)
+        if call is None:
             return
 
-        w3 = Web3(Web3.HTTPProvider(settings.ETHEREUM_NODE_URL))
-        if not w3.is_connected():
-            raise Exception("Blockchain node not connected")
+        lock.reacquire() # Raises LockNotOwnedError if it expired meanwhile
+        sent = client.send(call)
+
+        submitted_at = datetime.now(timezone.utc)
+        for payment in batch:
+            payment.settlement_status = SettlementStatus.SUBMITTED
+            payment.settlement_tx_hash = sent.tx_hash
+            payment.settlement_submitted_at = submitted_at
+            payment.settlement_nonce = sent.nonce
+            payment.settlement_gas_price = sent.gas_price
+            payment.settlement_replaced_tx_hashes = None
+        db.commit()
+        settlement_transactions.labels("submitted").inc()
+        settlement_batch_size.observe(len(batch))
 
-        contract = w3.eth.contract(address=settings.SETTLEMENT_CONTRACT_ADDRESS, abi=CONTRACT_ABI)
-        
-        # Prepare data
+        print(f"Settlement batch of {len(batch)} submitted to blockchain: {sent.tx_hash}")
+    finally:
+        db.close()
+
+def _settlement_call(client: SettlementClient, payments: list[Payment]):
+    """
+    The contract call recording `payments`, and the payments it covers.
+    Payments whose users have no wallet are left out. Returns (None, [])
+    when nothing is left.
+    """
+    batch = []
+    payers, payees, amounts, hashes = [], [], [], []
+    for payment in payments:
         # Assuming User model has wallet_address. If not, we can't settle on chain.
         payer_wallet = payment.from_user.wallet_address
         payee_wallet = payment.to_user.wallet_address
-        
         if not payer_wallet or not payee_wallet:
-            print(f"Users for payment {payment_id} do not have wallet addresses.")
-            return
+            print(f"Users for payment {payment.id} do not have wallet addresses.")
+            continue
 
-        amount_wei = int(payment.amount * 10**18) # Assuming 18 decimals
-        settlement_hash = Web3.solidity_keccak(
-            ['address', 'address', 'uint256', 'uint256'],
-            [payer_wallet, payee_wallet, amount_wei, int(payment.id)]
-        )
-
-        # Build transaction
-        account = Account.from_key(settings.PRIVATE_KEY)
-        nonce = w3.eth.get_transaction_count(account.address)
-        
-        tx = contract.functions.recordSettlement(
-            payer_wallet,
-            payee_wallet,
-            amount_wei,
-            settlement_hash
-        ).build_transaction({
-            'chainId': 1337, # Localhost / Ganache
-            'gas': 2000000,
-            'gasPrice': w3.eth.gas_price,
-            'nonce': nonce,
-        })
-        
-        signed_tx = w3.eth.account.sign_transaction(tx, settings.PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        
-        # Wait for receipt? Or just fire and forget?
-        # User said "Settlement writing is async".
-        # We can wait for receipt to ensure it succeeded.
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        
-        if receipt.status != 1:
-            raise Exception("Transaction failed on chain")
-            
-        print(f"Settlement written to blockchain: {tx_hash.hex()}")
+        amount_wei = payment.amount_cents * 10**16 # Cents to 18 decimals, exact
+        batch.append(payment)
+        payers.append(payer_wallet)
+        payees.append(payee_wallet)
+        amounts.append(amount_wei)
+        hashes.append(settlement_hash(payer_wallet, payee_wallet, amount_wei, int(payment.id)))
 
-    except Exception as e:
-        print(f"Error writing settlement: {e}")
-        self.retry(exc=e, countdown=60)
+    if not hashes:
+        return None, []
+
+    # Health is tracked in the background, no round trip here
+    if not client.connected:
+        raise Exception("Blockchain node not connected")
+
+    if settings.SETTLEMENT_BATCH_MODE == "merkle":
+        call = client.contract.functions.recordSettlementRoot(merkle_root(hashes), len(hashes))
+    else:
+        call = client.contract.functions.recordSettlements(payers, payees, amounts, hashes)
+    return call, batch
+
+@celery_app.task
+def poll_settlement_receipts():
+    client = get_settlement_client(CONTRACT_ABI)
+    if client is None:
+        return
+
+    db = SessionLocal()
+    try:
+        check_settlement_receipts(db, client)
     finally:
         db.close()
+
+def replacement_gas_price(client: SettlementClient, gas_price: int) -> int:
+    # Nodes only accept a replacement paying at least 10% more than the original
+    return max(client.gas_price(), gas_price * 9 // 8 + 1)
+
+def check_settlement_receipts(db: Session, client: SettlementClient) -> dict[str, SettlementStatus]:
+    """
+    Looks up the receipts of every submitted settlement transaction in a single
+    JSON-RPC batch and records the outcome. Reverted transactions are marked
+    failed and their payments queued for the next batch.
+
+    A transaction still unmined after SETTLEMENT_RECEIPT_TIMEOUT is replaced:
+    sent again with the same nonce and a higher gas price, so at most one of
+    them can be mined. The receipts of the hashes it replaced keep being looked
+    up, the first one mined resolves the payments. When none of them is mined
+    but the nonce has been used anyway (the node dropped the transaction and a
+    later batch reused it), the payments are failed and queued again.
+
+    Works against any JSON-RPC node (including a local stand-in) through `client.w3`.
+    Returns the new status of every transaction that was resolved, by mined hash.
+    """
+    submitted = db.query(Payment).options(
+        joinedload(Payment.from_user), joinedload(Payment.to_user)
+    ).filter(
+        Payment.settlement_status == SettlementStatus.SUBMITTED
+    ).order_by(Payment.id).all()
+    if not submitted:
+        return {}
+
+    # One transaction per hash, with every hash broadcast for its nonce
+    batches: dict[str, list[Payment]] = {}
+    for payment in submitted:
+        batches.setdefault(payment.settlement_tx_hash, []).append(payment)
+    candidates = {
+        tx_hash: [tx_hash, *(payments[0].settlement_replaced_tx_hashes or [])]
+        for tx_hash, payments in batches.items()
+    }
+
+    deadline = datetime.now(timezone.utc) - timedelta(seconds=settings.SETTLEMENT_RECEIPT_TIMEOUT)
+    stuck = {
+        tx_hash for tx_hash, payments in batches.items()
+        if min(_as_utc(p.settlement_submitted_at) for p in payments) < deadline
+    }
+    # Read before the receipts: a nonce that was already used then, while none
+    # of the batch's hashes has a receipt afterwards, went to another transaction
+    used_nonces = client.w3.eth.get_transaction_count(client.account.address, "latest") if stuck else 0
+    receipts = _fetch_receipts(client, [h for hashes in candidates.values() for h in hashes])
+
+    resolved = {}
+    retry_ids = []
+
+    def record_mined(mined: str, payments: list[Payment]):
+        ok = int(receipts[mined]["status"], 16) == 1
+        status = SettlementStatus.CONFIRMED if ok else SettlementStatus.FAILED
+        resolved[mined] = status
+        settlement_transactions.labels("confirmed" if ok else "reverted").inc()
+        for payment in payments:
+            payment.settlement_status = status
+            payment.settlement_tx_hash = mined
+        if not ok:
+            retry_ids.extend(p.id for p in payments)
+
+    def record_dropped(tx_hash: str, payments: list[Payment]):
+        resolved[tx_hash] = SettlementStatus.FAILED
+        settlement_transactions.labels("dropped").inc()
+        for payment in payments:
+            payment.settlement_status = SettlementStatus.FAILED
+        retry_ids.extend(p.id for p in payments)
+
+    for tx_hash, payments in batches.items():
+        mined = next((h for h in candidates[tx_hash] if receipts.get(h)), None)
+        if mined is not None:
+            record_mined(mined, payments)
+            continue
+        if tx_hash not in stuck:
+            continue
+
+        lead = payments[0]
+        if lead.settlement_nonce is None or used_nonces > lead.settlement_nonce:
+            # Sent before nonces were recorded, or dropped by the node and its
+            # nonce reused by a later batch: nothing left to replace
+            record_dropped(tx_hash, payments)
+            continue
+
+        try:
+            call, _ = _settlement_call(client, payments)
+            sent = client.send(
+                call,
+                nonce=lead.settlement_nonce,
+                gas_price=replacement_gas_price(client, lead.settlement_gas_price),
+            )
+        except Exception as e:
+            if not _nonce_used(e):
+                print(f"Could not replace settlement transaction {tx_hash}: {e}")
+                continue
+            # The nonce was used since it was read, by one of these hashes or another transaction
+            receipts.update(_fetch_receipts(client, candidates[tx_hash]))
+            mined = next((h for h in candidates[tx_hash] if receipts.get(h)), None)
+            if mined is not None:
+                record_mined(mined, payments)
+            else:
+                record_dropped(tx_hash, payments)
+            continue
+
+        settlement_transactions.labels("replaced").inc()
+        replaced_at = datetime.now(timezone.utc)
+        for payment in payments:
+            payment.settlement_tx_hash = sent.tx_hash
+            payment.settlement_gas_price = sent.gas_price
+            payment.settlement_submitted_at = replaced_at
+            payment.settlement_replaced_tx_hashes = candidates[tx_hash]
+        print(f"Settlement transaction {tx_hash} unmined, replaced by {sent.tx_hash}")
+
+    failed = [h for h, status in resolved.items() if status == SettlementStatus.FAILED]
+    if failed:
+        print(f"Settlement transactions failed or dropped, re-queueing: {failed}")
+
+    db.commit()
+    queue_settlements(retry_ids)
+    return resolved
+
+def _fetch_receipts(client: SettlementClient, hashes: list[str]) -> dict[str, Optional[dict]]:
+    # One JSON-RPC batch, None for the hashes that are not mined (yet)
+    responses = client.w3.provider.make_batch_request(
+        [("eth_getTransactionReceipt", [h]) for h in hashes]
+    )
+    if not isinstance(responses, list):
+        raise Exception(f"Receipt batch request failed: {responses.get('error')}")
+    return {h: response.get("result") for h, response in zip(hashes, responses)}
+
+# Messages nodes reject a transaction with when its nonce was already mined
+NONCE_USED_ERRORS = ("nonce too low", "nonce has already been used")
+
+def _nonce_used(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in NONCE_USED_ERRORS)
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
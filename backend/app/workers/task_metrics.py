@@ -0,0 +1,48 @@
+"""
+Celery task metrics: the runtime of every task by final state, recorded
+through task signals in the process that ran it, and the throughput of the
+settlement path (outbox relay, batch flush, receipt polling), recorded by
+those tasks.
+
+With WORKER_METRICS_PORT set, the worker's main process serves them. Prefork
+pools run tasks in child processes, set PROMETHEUS_MULTIPROC_DIR so their
+samples reach the main process. Queue depths are exposed by the API.
+"""
+import time
+from celery.signals import task_postrun, task_prerun, worker_init
+from prometheus_client import Counter, Histogram, start_http_server
+from app.config import settings
+from app.core.metrics import scrape_registry
+
+task_runtime = Histogram(
+    "celery_task_duration_seconds", "Task runtime by task and final state",
+    ["task", "state"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+outbox_relayed = Counter("outbox_messages_relayed", "Outbox messages published by relay_outbox")
+settlement_batch_size = Histogram(
+    "settlement_batch_payments", "Payments recorded per settlement transaction",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+settlement_transactions = Counter(
+    "settlement_transactions", "Settlement transactions by outcome (submitted, confirmed, reverted, replaced, dropped)",
+    ["outcome"],
+)
+
+# task_id -> start time, for the tasks running in this process
+_started: dict[str, float] = {}
+
+@task_prerun.connect
+def _task_started(task_id=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        task_runtime.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+@worker_init.connect
+def _serve_metrics(**kwargs):
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=scrape_registry())
@@ -0,0 +1,138 @@
+"""
+Sync vs async request path under high concurrency.
+
+Serves the same handler (a user's balance aggregate, optionally behind a slow
+query) from a sync `def` route on FastAPI's threadpool and from an `async def`
+route on an AsyncSession, then fires `--requests` requests at each with
+`--concurrency` in flight. Reports throughput, latency percentiles and the
+peak number of requests that were inside a handler at the same time.
+
+    python benchmarks/async_load.py --concurrency 500 --requests 5000 --query-delay 0.05
+
+--query-delay uses pg_sleep and is ignored on databases other than Postgres.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.models import user, group, expense, payment, balance
+from app.services.balances import get_user_position
+
+class InFlight:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        self.current -= 1
+
+def build_app(pool_size: int, query_delay: float, user_id: int):
+    is_postgres = settings.SQLALCHEMY_DATABASE_URI.startswith("postgres")
+    pool_args = {"pool_size": pool_size, "max_overflow": 0} if is_postgres else {}
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **pool_args)
+    async_engine = create_async_engine(settings.SQLALCHEMY_ASYNC_DATABASE_URI, **pool_args)
+    SyncSession = sessionmaker(bind=engine, autoflush=False)
+    AsyncSessionFactory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    slow_query = text("SELECT pg_sleep(:delay)") if is_postgres and query_delay else None
+
+    in_flight = {"sync": InFlight(), "async": InFlight()}
+    app = FastAPI()
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    @app.get("/sync")
+    def sync_balance(db: Session = Depends(get_sync_db)):
+        with in_flight["sync"]:
+            if slow_query is not None:
+                db.execute(slow_query, {"delay": query_delay})
+            return get_user_position(db, user_id)
+
+    @app.get("/async")
+    async def async_balance(db: AsyncSession = Depends(get_async_db)):
+        with in_flight["async"]:
+            if slow_query is not None:
+                await db.execute(slow_query, {"delay": query_delay})
+            return await db.run_sync(get_user_position, user_id)
+
+    return app, in_flight, (engine, async_engine)
+
+async def run(app, path: str, concurrency: int, total: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(client):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await one(client) # warm up the pools
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client) for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async request throughput at high concurrency.")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--pool-size", type=int, default=100, help="Connections per engine (Postgres only)")
+    parser.add_argument("--query-delay", type=float, default=0.05, help="Seconds of pg_sleep per request")
+    parser.add_argument("--user-id", type=int, default=1)
+    args = parser.parse_args()
+
+    app, in_flight, engines = build_app(args.pool_size, args.query_delay, args.user_id)
+    results = {}
+    try:
+        for mode in ("sync", "async"):
+            results[mode] = await run(app, f"/{mode}", args.concurrency, args.requests)
+            results[mode]["peak_in_flight"] = in_flight[mode].peak
+    finally:
+        engine, async_engine = engines
+        engine.dispose()
+        await async_engine.dispose()
+
+    print(json.dumps({"concurrency": args.concurrency, "query_delay": args.query_delay, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Cold start of the API process.
+
+Starts `--runs` fresh interpreters, each of which imports app.main, runs the
+lifespan startup and serves one request through the ASGI app. Reports the
+import time, the time to the first response (import included) and the whole
+process wall time, as JSON.
+
+Exits non-zero when a module that belongs to the workers (web3, eth_account,
+celery) or to the lazy remote auth fallback (supabase) is loaded by the API at
+startup, or when the median import time exceeds --max-import-seconds.
+
+    python benchmarks/cold_start.py --runs 10 --max-import-seconds 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Must not be imported by the API process before it serves
+FORBIDDEN_MODULES = ("web3", "eth_account", "celery", "supabase")
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def first_request():
+    import httpx
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+            response = await client.get({path!r})
+            response.raise_for_status()
+        return time.perf_counter()
+
+served = asyncio.run(first_request())
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "first_request_seconds": served - started,
+    "loaded": [m for m in {forbidden!r} if m in sys.modules],
+}}))
+"""
+
+def run_once(path: str) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(path=path, forbidden=FORBIDDEN_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["process_seconds"] = time.perf_counter() - started
+    return sample
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "median": round(statistics.median(values), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import time and time to first request.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/", help="Route served as the first request")
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    samples = [run_once(args.path) for _ in range(args.runs)]
+    loaded = sorted({module for sample in samples for module in sample["loaded"]})
+    report = {
+        "runs": args.runs,
+        "import_seconds": summarize([s["import_seconds"] for s in samples]),
+        "first_request_seconds": summarize([s["first_request_seconds"] for s in samples]),
+        "process_seconds": summarize([s["process_seconds"] for s in samples]),
+        "forbidden_modules_loaded": loaded,
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = bool(loaded)
+    if args.max_import_seconds is not None and report["import_seconds"]["median"] > args.max_import_seconds:
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
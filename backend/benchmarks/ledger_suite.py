@@ -0,0 +1,281 @@
+"""
+Ledger benchmark suite.
+
+Builds a synthetic population (see synthetic_ledger.py) and times the ledger
+one operation at a time:
+- reconcile_expense and reconcile_payment, each with the insert of its row
+  and its own commit, as the app writes them;
+- simplify_debts for every group left with unsimplified debts;
+- the main API endpoints through the ASGI app, as a member of the largest
+  group. Group responses are measured uncached (response cache cleared before
+  each request) and cached.
+
+Every scenario reports throughput, p50 / p99 latency and SQL statements per
+operation as JSON. --output saves the report, --baseline compares it with a
+saved one and exits non-zero on a regression: more SQL statements per
+operation, or a p99 more than --max-regression slower.
+
+Runs against a throwaway SQLite database, or against the scratch database in
+BENCHMARK_DATABASE_URL (e.g. a local Postgres), which must be empty.
+
+    python benchmarks/ledger_suite.py --users 2000 --groups 200 --expenses 20000 --output base.json
+    python benchmarks/ledger_suite.py --users 2000 --groups 200 --expenses 20000 --baseline base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Iterator, Union
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Never the configured database, the suite writes a synthetic population.
+# The async URI is derived from the sync one.
+os.environ["SQLALCHEMY_DATABASE_URI"] = os.environ.get("BENCHMARK_DATABASE_URL") or (
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ledger_suite.db')}"
+)
+os.environ.pop("SQLALCHEMY_ASYNC_DATABASE_URI", None)
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.main import app
+from app.api import deps
+from app.core.group_cache import group_cache
+from app.core.money import from_cents
+from app.core.tokens import AuthenticatedUser
+from app.db.base import Base
+from app.db.query_counter import QueryCounter
+from app.db.session import SessionLocal, engine, async_engine
+from app.models.balance import UserNetBalance
+from app.models.expense import Expense, ExpenseSplit
+from app.models.payment import Payment, PaymentStatus
+from app.models.user import User
+from app.services.reconciliation import reconcile_expense, reconcile_payment, simplify_debts
+from synthetic_ledger import LedgerSpec, SyntheticExpense, SyntheticLedger
+
+API = "/api/v1"
+
+# Read endpoints, and whether their response cache is cleared before each request
+API_READS = {
+    "GET /groups/{group_id}": ("/groups/{group_id}", True),
+    "GET /groups/{group_id} (cached)": ("/groups/{group_id}", False),
+    "GET /groups/{group_id}/balances": ("/groups/{group_id}/balances", True),
+    "GET /groups/{group_id}/balances (cached)": ("/groups/{group_id}/balances", False),
+    "GET /groups/{group_id}/expenses": ("/groups/{group_id}/expenses", True),
+    "GET /groups/": ("/groups/", True),
+    "GET /payments/": ("/payments/", True),
+    "GET /users/me/balance": ("/users/me/balance", True),
+}
+
+class Scenario:
+    """
+    Latency and SQL statement count of every operation of one scenario.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.statements: list[int] = []
+        self.errors = 0
+
+    @contextmanager
+    def op(self, bind: Union[Engine, AsyncEngine]) -> Iterator[None]:
+        with QueryCounter(bind) as counter:
+            started = time.perf_counter()
+            yield
+            self.latencies.append(time.perf_counter() - started)
+        self.statements.append(counter.count)
+
+    def summary(self) -> dict:
+        if not self.latencies:
+            return {"ops": 0, "errors": self.errors}
+        latencies = sorted(self.latencies)
+        return {
+            "ops": len(latencies),
+            "errors": self.errors,
+            "throughput_ops": round(len(latencies) / sum(latencies), 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+            "sql_per_op": round(statistics.mean(self.statements), 2),
+            "sql_max": max(self.statements),
+        }
+
+def prepare_database():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if db.execute(select(func.count()).select_from(User)).scalar():
+            sys.exit(f"{engine.url.render_as_string(hide_password=True)} is not empty, use a scratch database")
+
+def run_writes(ledger: SyntheticLedger) -> list[Scenario]:
+    expenses = Scenario("reconcile_expense")
+    payments = Scenario("reconcile_payment")
+    simplifications = Scenario("simplify_debts")
+    db = SessionLocal()
+    try:
+        for item in ledger.expenses():
+            with expenses.op(engine):
+                expense = Expense(group_id=item.group_id, paid_by_id=item.paid_by_id, amount_cents=item.amount_cents)
+                expense.splits = [ExpenseSplit(user_id=user_id, amount_cents=cents) for user_id, cents in item.splits]
+                db.add(expense)
+                db.flush()
+                reconcile_expense(db, expense)
+                db.commit()
+
+        for item in ledger.payments():
+            with payments.op(engine):
+                payment = Payment(**asdict(item), status=PaymentStatus.CONFIRMED)
+                db.add(payment)
+                db.flush()
+                reconcile_payment(db, payment)
+                db.commit()
+
+        group_ids = db.execute(
+            select(UserNetBalance.group_id).where(UserNetBalance.dirty.is_(True)).distinct()
+        ).scalars().all()
+        for group_id in group_ids:
+            with simplifications.op(engine):
+                simplify_debts(db, group_id) # Commits
+    finally:
+        db.close()
+    return [expenses, payments, simplifications]
+
+def expense_body(item: SyntheticExpense) -> dict:
+    return {
+        "group_id": item.group_id,
+        "paid_by_id": item.paid_by_id,
+        "amount": str(from_cents(item.amount_cents)),
+        # A zero share owes nothing, and the API only takes positive amounts
+        "splits": [{"user_id": user_id, "amount": str(from_cents(cents))} for user_id, cents in item.splits if cents],
+    }
+
+async def run_api(ledger: SyntheticLedger, requests: int) -> list[Scenario]:
+    group_id = ledger.largest_group
+    member_ids = ledger.members[group_id]
+    with SessionLocal() as db:
+        supabase_id = db.get(User, member_ids[0]).supabase_id
+
+    async def current_identity():
+        return AuthenticatedUser(id=supabase_id, email=f"{supabase_id}@example.com")
+    app.dependency_overrides[deps.get_supabase_user] = current_identity
+
+    scenarios = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url=f"http://bench{API}") as client:
+        for name, (route, uncached) in API_READS.items():
+            path = route.format(group_id=group_id)
+            await client.get(path) # Warms the identity and membership caches
+            scenario = Scenario(name)
+            for _ in range(requests):
+                if uncached:
+                    group_cache.clear()
+                with scenario.op(async_engine):
+                    response = await client.get(path)
+                if response.status_code != 200:
+                    scenario.errors += 1
+            scenarios.append(scenario)
+
+        created = Scenario("POST /expenses/")
+        for _ in range(requests):
+            body = expense_body(ledger.expense(group_id))
+            with created.op(async_engine):
+                response = await client.post("/expenses/", json=body)
+            if response.status_code != 200:
+                created.errors += 1
+        scenarios.append(created)
+
+        confirmed = Scenario("POST /payments/{payment_id}/confirm")
+        for _ in range(requests):
+            from_user_id, to_user_id = ledger.rng.sample(member_ids, 2)
+            payment = (await client.post("/payments/", json={
+                "group_id": group_id, "from_user_id": from_user_id, "to_user_id": to_user_id, "amount": "1.00",
+            })).json()
+            with confirmed.op(async_engine):
+                response = await client.post(f"/payments/{payment['id']}/confirm")
+            if response.status_code != 200:
+                confirmed.errors += 1
+        scenarios.append(confirmed)
+
+    app.dependency_overrides.clear()
+    await async_engine.dispose()
+    return scenarios
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Adds the baseline figures to every scenario of `report` and returns its regressions.
+    """
+    if (baseline["spec"], baseline["database"]) != (report["spec"], report["database"]):
+        sys.exit("The baseline was run with another spec or database, its results are not comparable")
+
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if not previous or not previous.get("ops") or not current.get("ops"):
+            continue
+        current["baseline"] = {key: previous[key] for key in ("throughput_ops", "p50_ms", "p99_ms", "sql_per_op")}
+        if current["sql_per_op"] > previous["sql_per_op"]:
+            regressions.append(f"{name}: {previous['sql_per_op']} -> {current['sql_per_op']} SQL statements per operation")
+        if current["p99_ms"] > previous["p99_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p99 {previous['p99_ms']} -> {current['p99_ms']} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reconciliation, simplification and the API on a synthetic ledger.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=5000)
+    parser.add_argument("--payments", type=int, default=1000)
+    parser.add_argument("--max-group-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--api-requests", type=int, default=200, help="Requests per API endpoint")
+    parser.add_argument("--label", default=None, help="Free-form name stored in the report")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Compare with a report saved by --output")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p99 slowdown against the baseline")
+    args = parser.parse_args()
+
+    spec = LedgerSpec(
+        users=args.users, groups=args.groups, expenses=args.expenses, payments=args.payments,
+        max_group_size=args.max_group_size, seed=args.seed,
+    )
+    prepare_database()
+    with SessionLocal() as db:
+        ledger = SyntheticLedger(spec).populate(db)
+
+    scenarios = run_writes(ledger) + asyncio.run(run_api(ledger, args.api_requests))
+    engine.dispose()
+
+    report = {
+        "label": args.label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "database": engine.dialect.name,
+        "python": platform.python_version(),
+        "spec": asdict(spec),
+        "largest_group_size": len(ledger.members[ledger.largest_group]),
+        "scenarios": {scenario.name: scenario.summary() for scenario in scenarios},
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Decimal vs integer-cent ledger arithmetic.
+
+Generates `--expenses` random expenses over `--users` group members, then
+folds them the way the reconciliation path does: split deltas per pair, net
+and gross positions per user, and a greedy settlement plan. Runs the fold once
+on Decimal amounts (as stored before amounts moved to cents) and once on int
+cents, checks that both produce the same ledger, and reports the time of each
+as JSON.
+
+    python benchmarks/money_fold.py --users 200 --expenses 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.money import from_cents, split_evenly
+from app.services.balances import to_pair_deltas
+from app.services.ledger import positions_from_pairs
+from app.services.reconciliation import split_deltas
+from app.services.settlement_solver import solve
+
+def generate(users: int, expenses: int, seed: int) -> list[tuple[int, list[tuple[int, int]]]]:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(expenses):
+        members = rng.sample(range(1, users + 1), rng.randint(2, min(users, 8)))
+        parts = split_evenly(rng.randint(100, 50_000), len(members))
+        rows.append((members[0], list(zip(members, parts))))
+    return rows
+
+def fold_cents(rows) -> tuple[dict, list]:
+    deltas = defaultdict(int)
+    for payer_id, splits in rows:
+        split_deltas(payer_id, splits, deltas)
+    pairs = to_pair_deltas(deltas)
+    positions = positions_from_pairs(pairs)
+    plan = solve({user_id: p["net"] for user_id, p in positions.items()}, "greedy")
+    return pairs, plan.transfers
+
+def fold_decimal(rows) -> tuple[dict, list]:
+    # The pre-cents path: Decimal sums, converted to cents only for the solver
+    deltas = defaultdict(Decimal)
+    for payer_id, splits in rows:
+        for split in splits:
+            if split.user_id != payer_id:
+                deltas[(split.user_id, payer_id)] += split.amount
+    pairs = defaultdict(Decimal)
+    for (debtor, creditor), amount in deltas.items():
+        if debtor < creditor:
+            pairs[(debtor, creditor)] += amount
+        else:
+            pairs[(creditor, debtor)] -= amount
+    nets = defaultdict(Decimal)
+    for (user_a, user_b), amount in pairs.items():
+        nets[user_a] -= amount
+        nets[user_b] += amount
+    plan = solve({user_id: int(net * 100) for user_id, net in nets.items()}, "greedy")
+    return {pair: int(amount * 100) for pair, amount in pairs.items()}, plan.transfers
+
+def timed(fold, rows, repeat: int) -> tuple[float, tuple]:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fold(rows)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Decimal and integer-cent ledger folds.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generated = generate(args.users, args.expenses, args.seed)
+    rows = [
+        (payer_id, [SimpleNamespace(user_id=u, amount_cents=c) for u, c in splits])
+        for payer_id, splits in generated
+    ]
+    decimal_rows = [
+        (payer_id, [SimpleNamespace(user_id=u, amount=from_cents(c)) for u, c in splits])
+        for payer_id, splits in generated
+    ]
+
+    cents_seconds, (cents_pairs, cents_transfers) = timed(fold_cents, rows, args.repeat)
+    decimal_seconds, (decimal_pairs, decimal_transfers) = timed(fold_decimal, decimal_rows, args.repeat)
+
+    same = (
+        {k: v for k, v in cents_pairs.items() if v} == {k: v for k, v in decimal_pairs.items() if v}
+        and cents_transfers == decimal_transfers
+    )
+    print(json.dumps({
+        "users": args.users,
+        "expenses": args.expenses,
+        "decimal_seconds": round(decimal_seconds, 4),
+        "cents_seconds": round(cents_seconds, 4),
+        "speedup": round(decimal_seconds / cents_seconds, 2),
+        "transfers": len(cents_transfers),
+        "identical": same,
+    }, indent=2))
+    sys.exit(0 if same else 1)
+
+if __name__ == "__main__":
+    main()
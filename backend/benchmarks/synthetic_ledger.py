@@ -0,0 +1,129 @@
+"""
+Synthetic group ledgers for the benchmarks.
+
+Sizes are heavy-tailed the way real usage is: most groups have a handful of
+members, most expenses are a few tens of units split between two or three
+people, and a few large groups, big-ticket expenses and whole-group splits
+dominate the tail. Larger groups are also the most active ones. Everything
+is drawn from one seeded generator, so two runs with the same spec build
+the same ledger and their results can be compared.
+"""
+import random
+from dataclasses import dataclass
+from typing import Iterator
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.core.money import allocate, split_evenly
+from app.models.group import Group, group_members
+from app.models.user import User
+
+# Pareto shapes, lower is a heavier tail
+GROUP_SIZE_ALPHA = 1.2
+FANOUT_ALPHA = 1.0
+# Log-normal amounts in cents: median e^8 ~ 30.00 for expenses, e^7 ~ 11.00 for payments
+EXPENSE_AMOUNT_MU, EXPENSE_AMOUNT_SIGMA = 8.0, 1.0
+PAYMENT_AMOUNT_MU, PAYMENT_AMOUNT_SIGMA = 7.0, 0.8
+# Share of expenses split across the whole group, and split by uneven weights
+WHOLE_GROUP_SHARE = 0.15
+WEIGHTED_SHARE = 0.3
+
+@dataclass
+class LedgerSpec:
+    users: int = 1000
+    groups: int = 100
+    expenses: int = 5000
+    payments: int = 1000
+    max_group_size: int = 50
+    seed: int = 42
+
+@dataclass
+class SyntheticExpense:
+    group_id: int
+    paid_by_id: int
+    splits: list[tuple[int, int]] # (user_id, cents), the payer's own share included
+
+    @property
+    def amount_cents(self) -> int:
+        return sum(cents for _, cents in self.splits)
+
+@dataclass
+class SyntheticPayment:
+    group_id: int
+    from_user_id: int
+    to_user_id: int
+    amount_cents: int
+
+class SyntheticLedger:
+    """
+    Inserts the users and groups of a spec, then yields its expenses and
+    payments for the caller to write and time.
+    """
+
+    def __init__(self, spec: LedgerSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.members: dict[int, list[int]] = {} # group_id -> member user ids
+
+    def populate(self, db: Session) -> "SyntheticLedger":
+        spec, rng = self.spec, self.rng
+        users = [
+            User(name=f"bench{i}", email=f"bench{i}@example.com", supabase_id=f"bench-{i}")
+            for i in range(spec.users)
+        ]
+        db.add_all(users)
+        db.flush()
+        user_ids = [user.id for user in users]
+
+        limit = min(spec.max_group_size, spec.users)
+        groups = [
+            (Group(name=f"bench{i}"), rng.sample(user_ids, min(limit, 1 + int(rng.paretovariate(GROUP_SIZE_ALPHA)))))
+            for i in range(spec.groups)
+        ]
+        db.add_all([group for group, _ in groups])
+        db.flush()
+        db.execute(insert(group_members), [
+            {"group_id": group.id, "user_id": user_id} for group, member_ids in groups for user_id in member_ids
+        ])
+        db.commit()
+        self.members = {group.id: member_ids for group, member_ids in groups}
+        return self
+
+    @property
+    def largest_group(self) -> int:
+        return max(self.members, key=lambda group_id: len(self.members[group_id]))
+
+    def _pick_group(self, count: int) -> list[int]:
+        # Activity grows with group size, groups of one never spend
+        group_ids = [group_id for group_id, member_ids in self.members.items() if len(member_ids) > 1]
+        weights = [len(self.members[group_id]) for group_id in group_ids]
+        return self.rng.choices(group_ids, weights=weights, k=count)
+
+    def _amount(self, mu: float, sigma: float) -> int:
+        return max(100, int(self.rng.lognormvariate(mu, sigma)))
+
+    def expense(self, group_id: int) -> SyntheticExpense:
+        rng = self.rng
+        member_ids = self.members[group_id]
+        if rng.random() < WHOLE_GROUP_SHARE:
+            fanout = len(member_ids)
+        else:
+            fanout = min(len(member_ids), 1 + int(rng.paretovariate(FANOUT_ALPHA)))
+        participants = rng.sample(member_ids, fanout)
+        total = self._amount(EXPENSE_AMOUNT_MU, EXPENSE_AMOUNT_SIGMA)
+        if rng.random() < WEIGHTED_SHARE:
+            parts = allocate(total, [rng.randint(1, 5) for _ in participants])
+        else:
+            parts = split_evenly(total, len(participants))
+        return SyntheticExpense(group_id=group_id, paid_by_id=participants[0], splits=list(zip(participants, parts)))
+
+    def expenses(self) -> Iterator[SyntheticExpense]:
+        for group_id in self._pick_group(self.spec.expenses):
+            yield self.expense(group_id)
+
+    def payments(self) -> Iterator[SyntheticPayment]:
+        for group_id in self._pick_group(self.spec.payments):
+            from_user_id, to_user_id = self.rng.sample(self.members[group_id], 2)
+            yield SyntheticPayment(
+                group_id=group_id, from_user_id=from_user_id, to_user_id=to_user_id,
+                amount_cents=self._amount(PAYMENT_AMOUNT_MU, PAYMENT_AMOUNT_SIGMA),
+            )
@@ -10,6 +10,12 @@ contract SettlementRegistry {
         uint256 timestamp
     );
 
+    event SettlementRootRecorded(
+        bytes32 indexed root,
+        uint256 count,
+        uint256 timestamp
+    );
+
     struct Settlement {
         address payer;
         address payee;
@@ -20,6 +26,9 @@ contract SettlementRegistry {
 
     mapping(bytes32 => Settlement) public settlements;
 
+    // Merkle root of a batch of settlement hashes => block timestamp it was recorded at
+    mapping(bytes32 => uint256) public settlementRoots;
+
     function recordSettlement(
         address _payer,
         address _payee,
@@ -27,7 +36,46 @@ contract SettlementRegistry {
         bytes32 _settlementHash
     ) external {
         require(!settlements[_settlementHash].exists, "Settlement already recorded");
+        _record(_payer, _payee, _amount, _settlementHash);
+    }
+
+    // Records many settlements in one transaction. Already recorded hashes are
+    // skipped so a retried batch does not revert as a whole.
+    function recordSettlements(
+        address[] calldata _payers,
+        address[] calldata _payees,
+        uint256[] calldata _amounts,
+        bytes32[] calldata _settlementHashes
+    ) external {
+        require(
+            _payers.length == _payees.length &&
+            _payers.length == _amounts.length &&
+            _payers.length == _settlementHashes.length,
+            "Length mismatch"
+        );
+
+        for (uint256 i = 0; i < _settlementHashes.length; i++) {
+            if (settlements[_settlementHashes[i]].exists) {
+                continue;
+            }
+            _record(_payers[i], _payees[i], _amounts[i], _settlementHashes[i]);
+        }
+    }
 
+    // Records only the Merkle root of a batch of settlement hashes.
+    // Individual settlements are proven with verifySettlementProof.
+    function recordSettlementRoot(bytes32 _root, uint256 _count) external {
+        require(settlementRoots[_root] == 0, "Root already recorded");
+        settlementRoots[_root] = block.timestamp;
+        emit SettlementRootRecorded(_root, _count, block.timestamp);
+    }
+
+    function _record(
+        address _payer,
+        address _payee,
+        uint256 _amount,
+        bytes32 _settlementHash
+    ) internal {
         settlements[_settlementHash] = Settlement({
             payer: _payer,
             payee: _payee,
@@ -42,4 +90,24 @@ contract SettlementRegistry {
     function verifySettlement(bytes32 _settlementHash) external view returns (bool) {
         return settlements[_settlementHash].exists;
     }
+
+    // Proof nodes are hashed in sorted pairs, matching the off-chain tree builder.
+    function verifySettlementProof(
+        bytes32 _root,
+        bytes32 _settlementHash,
+        bytes32[] calldata _proof
+    ) external view returns (bool) {
+        if (settlementRoots[_root] == 0) {
+            return false;
+        }
+
+        bytes32 node = _settlementHash;
+        for (uint256 i = 0; i < _proof.length; i++) {
+            bytes32 sibling = _proof[i];
+            node = node < sibling
+                ? keccak256(abi.encodePacked(node, sibling))
+                : keccak256(abi.encodePacked(sibling, node));
+        }
+        return node == _root;
+    }
 }
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.session import SessionLocal
+from app.models import user, group, expense, payment, balance
+from app.services.balances import check_user_positions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare materialized user balances against the pair ledger.")
+    parser.add_argument("--repair", action="store_true", help="Overwrite mismatching rows with ledger values")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatches = check_user_positions(db, repair=args.repair)
+        for m in mismatches:
+            print(f"group {m['group_id']} user {m['user_id']}: stored (net, owes, owed) = {m['stored']}, ledger = {m['expected']}")
+
+        if args.repair and mismatches:
+            db.commit()
+            print(f"Repaired {len(mismatches)} balances.")
+        elif not mismatches:
+            print("All user balances match the ledger.")
+    finally:
+        db.close()
+
+    sys.exit(1 if mismatches and not args.repair else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Query budget check for the read endpoints.
+
+Seeds a throwaway SQLite database with one large group, calls each endpoint
+through the ASGI app and fails if any of them runs more SQL statements than
+its budget. Budgets do not depend on the group's size, so a regression back
+to per-row lazy loading shows up as a failure. Versioned group responses are
+also checked warm: served from the response cache, and revalidated with
+If-None-Match to a 304.
+
+    python scripts/check_query_counts.py --members 50 --expenses 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Never run against the configured database, the check writes fixture data
+_db_path = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_db_path}"
+os.environ["SQLALCHEMY_ASYNC_DATABASE_URI"] = f"sqlite+aiosqlite:///{_db_path}"
+
+import httpx
+from app.main import app
+from app.api import deps
+from app.core.group_cache import group_cache
+from app.core.identity_cache import identity_cache
+from app.core.membership_cache import membership_cache
+from app.core.tokens import AuthenticatedUser
+from app.db.base import Base
+from app.db.query_counter import QueryBudgetExceeded, assert_max_queries
+from app.db.session import SessionLocal, engine, async_engine
+from app.models.expense import Expense, ExpenseSplit
+from app.models.group import Group
+from app.models.user import User
+from app.services.reconciliation import reconcile_expense
+
+# Endpoint -> maximum SQL statements per request, with cold identity, membership and response caches
+BUDGETS = {
+    "/api/v1/groups/{group_id}": 7,
+    "/api/v1/groups/{group_id}/balances": 4,
+    "/api/v1/groups/{group_id}/expenses": 4,
+    "/api/v1/payments/": 2,
+    "/api/v1/groups/": 2,
+    "/api/v1/users/me": 1,
+    "/api/v1/users/me/balance": 2,
+}
+
+# Versioned endpoints, warm: only the group version is read
+WARM_BUDGETS = {
+    "/api/v1/groups/{group_id}": 1,
+    "/api/v1/groups/{group_id}/balances": 1,
+}
+
+def seed(members: int, expenses: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        users = [User(name=f"user{i}", email=f"user{i}@example.com", supabase_id=f"sb-{i}") for i in range(members)]
+        group = Group(name="query budget", members=users)
+        db.add(group)
+        db.flush()
+        for i in range(expenses):
+            payer = users[i % members]
+            expense = Expense(group_id=group.id, paid_by_id=payer.id, amount_cents=members * 100)
+            expense.splits = [ExpenseSplit(user_id=user.id, amount_cents=100) for user in users]
+            db.add(expense)
+            db.flush()
+            reconcile_expense(db, expense)
+        db.commit()
+        return group.id
+    finally:
+        db.close()
+
+async def check(group_id: int) -> list[str]:
+    async def current_identity():
+        return AuthenticatedUser(id="sb-0", email="user0@example.com")
+    app.dependency_overrides[deps.get_supabase_user] = current_identity
+
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        for route, budget in BUDGETS.items():
+            path = route.format(group_id=group_id)
+            identity_cache.clear()
+            membership_cache.clear()
+            group_cache.clear()
+            try:
+                with assert_max_queries(async_engine, budget, label=f"GET {route}") as counter:
+                    response = await client.get(path)
+                print(f"GET {route}: {counter.count}/{budget} statements ({response.status_code})")
+                if response.status_code != 200:
+                    failures.append(f"GET {route} returned {response.status_code}")
+            except QueryBudgetExceeded as e:
+                failures.append(str(e))
+
+        for route, budget in WARM_BUDGETS.items():
+            path = route.format(group_id=group_id)
+            etag = (await client.get(path)).headers.get("etag")
+            for headers, expected in (({}, 200), ({"If-None-Match": etag}, 304)):
+                label = f"GET {route} ({'revalidated' if headers else 'cached'})"
+                try:
+                    with assert_max_queries(async_engine, budget, label=label) as counter:
+                        response = await client.get(path, headers=headers)
+                    print(f"{label}: {counter.count}/{budget} statements ({response.status_code})")
+                    if response.status_code != expected:
+                        failures.append(f"{label} returned {response.status_code}")
+                except QueryBudgetExceeded as e:
+                    failures.append(str(e))
+    await async_engine.dispose()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a read endpoint exceeds its SQL statement budget.")
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--expenses", type=int, default=500)
+    args = parser.parse_args()
+
+    group_id = seed(args.members, args.expenses)
+    failures = asyncio.run(check(group_id))
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models import user, group, expense, payment, balance, ledger
+from app.services.ledger import group_pairs_at, rebuild_group_balances, snapshot_ledgers, stored_group_pairs
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the ledger event log and compare it with the stored pair balances.")
+    parser.add_argument("--group", type=int, action="append", help="Only these groups (repeatable)")
+    parser.add_argument("--apply", action="store_true", help="Rewrite mismatching groups from the replayed ledger")
+    parser.add_argument("--snapshot", action="store_true", help="Snapshot every group with new events first")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.snapshot:
+            taken = snapshot_ledgers(db)
+            print(f"Took {taken} ledger snapshots.")
+
+        group_ids = args.group or db.execute(select(group.Group.id).order_by(group.Group.id)).scalars().all()
+        mismatched = []
+        for group_id in group_ids:
+            replayed = group_pairs_at(db, group_id)
+            stored = stored_group_pairs(db, group_id)
+            if replayed == stored:
+                continue
+            mismatched.append(group_id)
+            for pair in sorted(replayed.keys() | stored.keys()):
+                if replayed.get(pair) != stored.get(pair):
+                    print(f"group {group_id} pair {pair}: stored = {stored.get(pair, 0)}, replayed = {replayed.get(pair, 0)}")
+
+        if args.apply and mismatched:
+            for group_id in mismatched:
+                rebuild_group_balances(db, group_id)
+            db.commit()
+            print(f"Rebuilt {len(mismatched)} groups from the event log.")
+        elif not mismatched:
+            print("All pair balances match the event log.")
+    finally:
+        db.close()
+
+    sys.exit(1 if mismatched and not args.apply else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.models.payment import Payment, PaymentStatus, SettlementStatus
+from app.models.user import User
+from app.workers import settlement_writer
+from app.workers.settlement_client import SentTransaction
+
+class StubClient:
+    """
+    Stands in for SettlementClient: receipts come from `receipts` (hash ->
+    receipt) and the account's mined transaction count from `used_nonces`.
+    Sent transactions are recorded instead of broadcast, or fail with
+    `send_error` when set.
+    """
+
+    def __init__(self, receipts=None, gas_price=100, used_nonces=0):
+        self.receipts = receipts or {}
+        self.current_gas_price = gas_price
+        self.used_nonces = used_nonces
+        self.send_error = None
+        self.connected = True
+        self.sent = []
+        self.batch_requests = []
+        self.account = SimpleNamespace(address="0x" + "33" * 20)
+        self.w3 = SimpleNamespace(
+            provider=SimpleNamespace(make_batch_request=self._batch),
+            eth=SimpleNamespace(get_transaction_count=self._transaction_count),
+        )
+        self.contract = SimpleNamespace(functions=SimpleNamespace(
+            recordSettlements=lambda *args: ("recordSettlements", args),
+            recordSettlementRoot=lambda *args: ("recordSettlementRoot", args),
+        ))
+
+    def _batch(self, requests):
+        self.batch_requests.append(requests)
+        return [
+            {"jsonrpc": "2.0", "id": i, "result": self.receipts.get(params[0])}
+            for i, (method, params) in enumerate(requests)
+        ]
+
+    def _transaction_count(self, address, block):
+        assert (address, block) == (self.account.address, "latest")
+        return self.used_nonces
+
+    def gas_price(self):
+        return self.current_gas_price
+
+    def send(self, call, nonce=None, gas_price=None):
+        if self.send_error is not None:
+            raise self.send_error
+        tx_hash = f"0xreplacement{len(self.sent)}"
+        self.sent.append((call, nonce, gas_price))
+        return SentTransaction(tx_hash, nonce, gas_price)
+
+@pytest.fixture
+def queued(monkeypatch):
+    ids = []
+    monkeypatch.setattr(settlement_writer, "queue_settlements", ids.extend)
+    return ids
+
+def submit(db, tx_hash, age=0, nonce=7, gas_price=100, count=2):
+    payer = User(name="payer", wallet_address="0x" + "11" * 20)
+    payee = User(name="payee", wallet_address="0x" + "22" * 20)
+    db.add_all([payer, payee])
+    db.flush()
+    submitted_at = datetime.now(timezone.utc) - timedelta(seconds=age)
+    payments = [
+        Payment(
+            from_user_id=payer.id, to_user_id=payee.id, amount_cents=150,
+            status=PaymentStatus.CONFIRMED,
+            settlement_status=SettlementStatus.SUBMITTED,
+            settlement_tx_hash=tx_hash,
+            settlement_submitted_at=submitted_at,
+            settlement_nonce=nonce,
+            settlement_gas_price=gas_price,
+        )
+        for _ in range(count)
+    ]
+    db.add_all(payments)
+    db.commit()
+    return payments
+
+def statuses(db, payments):
+    for payment in payments:
+        db.refresh(payment)
+    return {payment.settlement_status for payment in payments}
+
+def test_mined_transaction_is_confirmed(db, queued):
+    payments = submit(db, "0xok")
+    client = StubClient({"0xok": {"status": "0x1"}})
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {"0xok": SettlementStatus.CONFIRMED}
+    assert statuses(db, payments) == {SettlementStatus.CONFIRMED}
+    assert queued == []
+    assert client.sent == []
+
+def test_reverted_transaction_fails_and_requeues(db, queued):
+    payments = submit(db, "0xbad")
+    client = StubClient({"0xbad": {"status": "0x0"}})
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {"0xbad": SettlementStatus.FAILED}
+    assert statuses(db, payments) == {SettlementStatus.FAILED}
+    assert sorted(queued) == sorted(p.id for p in payments)
+    assert client.sent == []
+
+def test_recent_unmined_transaction_is_left_alone(db, queued):
+    payments = submit(db, "0xwait", age=settings.SETTLEMENT_RECEIPT_TIMEOUT // 2)
+    client = StubClient()
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {}
+    assert statuses(db, payments) == {SettlementStatus.SUBMITTED}
+    assert client.sent == []
+
+def test_stuck_transaction_is_replaced_with_same_nonce(db, queued):
+    payments = submit(db, "0xstuck", age=settings.SETTLEMENT_RECEIPT_TIMEOUT + 1, nonce=7, gas_price=100)
+    client = StubClient(gas_price=90)
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {}
+    [(call, nonce, gas_price)] = client.sent
+    assert call[0] == "recordSettlements"
+    assert nonce == 7
+    assert gas_price > 100 * 1.1
+
+    assert statuses(db, payments) == {SettlementStatus.SUBMITTED}
+    assert {p.settlement_tx_hash for p in payments} == {"0xreplacement0"}
+    assert {p.settlement_gas_price for p in payments} == {gas_price}
+    assert all(p.settlement_replaced_tx_hashes == ["0xstuck"] for p in payments)
+    assert queued == []
+
+def test_replaced_hash_mined_resolves_the_payments(db, queued):
+    payments = submit(db, "0xstuck", age=settings.SETTLEMENT_RECEIPT_TIMEOUT + 1)
+    client = StubClient()
+    settlement_writer.check_settlement_receipts(db, client)
+
+    # The original transaction is mined after all, the replacement never will be
+    client.receipts["0xstuck"] = {"status": "0x1"}
+    assert settlement_writer.check_settlement_receipts(db, client) == {"0xstuck": SettlementStatus.CONFIRMED}
+    assert client.batch_requests[-1] == [
+        ("eth_getTransactionReceipt", ["0xreplacement0"]),
+        ("eth_getTransactionReceipt", ["0xstuck"]),
+    ]
+    assert statuses(db, payments) == {SettlementStatus.CONFIRMED}
+    assert {p.settlement_tx_hash for p in payments} == {"0xstuck"}
+    assert len(client.sent) == 1
+
+def test_dropped_transaction_with_reused_nonce_fails_and_requeues(db, queued):
+    # The node dropped the transaction and a later batch was sent with nonce 7
+    payments = submit(db, "0xdropped", age=settings.SETTLEMENT_RECEIPT_TIMEOUT + 1, nonce=7)
+    client = StubClient(used_nonces=8)
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {"0xdropped": SettlementStatus.FAILED}
+    assert statuses(db, payments) == {SettlementStatus.FAILED}
+    assert sorted(queued) == sorted(p.id for p in payments)
+    assert client.sent == []
+
+def test_replacement_rejected_for_used_nonce_fails_and_requeues(db, queued):
+    # The nonce is taken between reading the count and sending the replacement
+    payments = submit(db, "0xdropped", age=settings.SETTLEMENT_RECEIPT_TIMEOUT + 1, nonce=7)
+    client = StubClient(used_nonces=7)
+    client.send_error = ValueError({"code": -32000, "message": "nonce too low"})
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {"0xdropped": SettlementStatus.FAILED}
+    assert statuses(db, payments) == {SettlementStatus.FAILED}
+    assert sorted(queued) == sorted(p.id for p in payments)
+    # The receipts were looked up again before giving up on the batch
+    assert client.batch_requests[-1] == [("eth_getTransactionReceipt", ["0xdropped"])]
+
+def test_replacement_rejected_because_original_was_mined(db, queued):
+    payments = submit(db, "0xlate", age=settings.SETTLEMENT_RECEIPT_TIMEOUT + 1, nonce=7)
+    client = StubClient(used_nonces=7)
+    client.send_error = ValueError({"code": -32000, "message": "nonce too low"})
+    original_batch = client._batch
+
+    def mined_meanwhile(requests):
+        responses = original_batch(requests)
+        client.receipts["0xlate"] = {"status": "0x1"}
+        return responses
+    client.w3.provider.make_batch_request = mined_meanwhile
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {"0xlate": SettlementStatus.CONFIRMED}
+    assert statuses(db, payments) == {SettlementStatus.CONFIRMED}
+    assert queued == []
+
+def test_other_send_errors_retry_on_next_poll(db, queued):
+    payments = submit(db, "0xstuck", age=settings.SETTLEMENT_RECEIPT_TIMEOUT + 1, nonce=7)
+    client = StubClient(used_nonces=7)
+    client.send_error = ValueError({"code": -32000, "message": "replacement transaction underpriced"})
+
+    assert settlement_writer.check_settlement_receipts(db, client) == {}
+    assert statuses(db, payments) == {SettlementStatus.SUBMITTED}
+    assert {p.settlement_tx_hash for p in payments} == {"0xstuck"}
+    assert queued == []
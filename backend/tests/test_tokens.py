@@ -0,0 +1,185 @@
+import asyncio
+import io
+import json
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jwt.algorithms import RSAAlgorithm
+
+from app.api import deps
+from app.config import settings
+from app.core import tokens
+from app.core.tokens import LocalTokenVerifier, UnverifiableTokenError
+
+SECRET = "test-secret-with-at-least-32-bytes!"
+ISSUER = "https://example.supabase.co/auth/v1"
+JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
+
+def claims(**overrides):
+    return {
+        "sub": "user-1",
+        "email": "user@example.com",
+        "aud": "authenticated",
+        "iss": ISSUER,
+        "exp": int(time.time()) + 300,
+        **overrides,
+    }
+
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+def public_jwk(private_key, kid):
+    return {**RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True), "kid": kid, "use": "sig", "alg": "RS256"}
+
+class StubJWKS:
+    """
+    Serves `keys` in place of the JWKS endpoint and counts the fetches.
+    """
+
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.fetches = 0
+
+    def urlopen(self, request, timeout=None, context=None):
+        assert request.full_url == JWKS_URL
+        self.fetches += 1
+        return io.BytesIO(json.dumps({"keys": self.keys}).encode())
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tokens, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def hs256_verifier(**kwargs):
+    return LocalTokenVerifier(secret=SECRET, audience="authenticated", issuer=ISSUER, **kwargs)
+
+def rs256_verifier(monkeypatch, jwks):
+    monkeypatch.setattr("urllib.request.urlopen", jwks.urlopen)
+    return LocalTokenVerifier(jwks_url=JWKS_URL, audience="authenticated", issuer=ISSUER)
+
+def test_hs256_valid_token():
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+    user = hs256_verifier().verify(token)
+    assert user.id == "user-1"
+    assert user.email == "user@example.com"
+
+def test_hs256_expired_token():
+    token = jwt.encode(claims(exp=int(time.time()) - 10), SECRET, algorithm="HS256")
+    with pytest.raises(jwt.ExpiredSignatureError):
+        hs256_verifier().verify(token)
+
+def test_hs256_expired_token_within_leeway():
+    token = jwt.encode(claims(exp=int(time.time()) - 10), SECRET, algorithm="HS256")
+    assert hs256_verifier(leeway=60).verify(token).id == "user-1"
+
+def test_hs256_wrong_audience():
+    token = jwt.encode(claims(aud="anon"), SECRET, algorithm="HS256")
+    with pytest.raises(jwt.InvalidAudienceError):
+        hs256_verifier().verify(token)
+
+def test_hs256_wrong_secret():
+    token = jwt.encode(claims(), "another-secret-with-at-least-32-bytes", algorithm="HS256")
+    with pytest.raises(jwt.InvalidSignatureError):
+        hs256_verifier().verify(token)
+
+def test_hs256_without_secret_is_unverifiable():
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+    with pytest.raises(UnverifiableTokenError):
+        LocalTokenVerifier(audience="authenticated", issuer=ISSUER).verify(token)
+
+def test_rs256_valid_token_uses_cached_jwks(monkeypatch, clock):
+    key = rsa_key()
+    jwks = StubJWKS(public_jwk(key, "k1"))
+    verifier = rs256_verifier(monkeypatch, jwks)
+    token = jwt.encode(claims(), key, algorithm="RS256", headers={"kid": "k1"})
+
+    assert verifier.verify(token).id == "user-1"
+    assert verifier.verify(token).id == "user-1"
+    assert jwks.fetches == 1
+
+def test_rs256_key_rotation_refreshes_jwks(monkeypatch, clock):
+    old, new = rsa_key(), rsa_key()
+    jwks = StubJWKS(public_jwk(old, "old"))
+    verifier = rs256_verifier(monkeypatch, jwks)
+    assert verifier.verify(jwt.encode(claims(), old, algorithm="RS256", headers={"kid": "old"}))
+
+    jwks.keys = [public_jwk(old, "old"), public_jwk(new, "new")]
+    token = jwt.encode(claims(), new, algorithm="RS256", headers={"kid": "new"})
+    assert verifier.verify(token).id == "user-1"
+    assert jwks.fetches == 2
+
+def test_rs256_unknown_kid_refreshes_once_per_cooldown(monkeypatch, clock):
+    key = rsa_key()
+    jwks = StubJWKS(public_jwk(key, "k1"))
+    verifier = rs256_verifier(monkeypatch, jwks)
+    unknown = jwt.encode(claims(), rsa_key(), algorithm="RS256", headers={"kid": "made-up"})
+
+    with pytest.raises(UnverifiableTokenError):
+        verifier.verify(unknown)
+    assert jwks.fetches == 2 # First load, then one refresh
+
+    clock[0] += verifier.refresh_cooldown - 1
+    with pytest.raises(UnverifiableTokenError):
+        verifier.verify(unknown)
+    assert jwks.fetches == 2
+
+    clock[0] += 1
+    with pytest.raises(UnverifiableTokenError):
+        verifier.verify(unknown)
+    assert jwks.fetches == 3
+
+def test_rs256_wrong_audience(monkeypatch, clock):
+    key = rsa_key()
+    verifier = rs256_verifier(monkeypatch, StubJWKS(public_jwk(key, "k1")))
+    token = jwt.encode(claims(aud="anon"), key, algorithm="RS256", headers={"kid": "k1"})
+    with pytest.raises(jwt.InvalidAudienceError):
+        verifier.verify(token)
+
+def authenticate(token):
+    return asyncio.run(deps.get_supabase_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+@pytest.fixture
+def remote_users(monkeypatch):
+    checked = []
+    def get_remote_supabase_user(token):
+        checked.append(token)
+        return SimpleNamespace(id="remote-user", email=None)
+    monkeypatch.setattr(deps, "get_remote_supabase_user", get_remote_supabase_user)
+    return checked
+
+def test_unverifiable_token_falls_back_to_remote_check(monkeypatch, remote_users):
+    monkeypatch.setattr(deps, "token_verifier", LocalTokenVerifier(audience="authenticated", issuer=ISSUER))
+    monkeypatch.setattr(settings, "AUTH_REMOTE_FALLBACK", True)
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+
+    assert authenticate(token).id == "remote-user"
+    assert remote_users == [token]
+
+def test_unverifiable_token_rejected_without_fallback(monkeypatch, remote_users):
+    monkeypatch.setattr(deps, "token_verifier", LocalTokenVerifier(audience="authenticated", issuer=ISSUER))
+    monkeypatch.setattr(settings, "AUTH_REMOTE_FALLBACK", False)
+
+    with pytest.raises(HTTPException) as error:
+        authenticate(jwt.encode(claims(), SECRET, algorithm="HS256"))
+    assert error.value.status_code == 401
+    assert remote_users == []
+
+def test_invalid_token_is_rejected_without_remote_check(monkeypatch, remote_users):
+    monkeypatch.setattr(deps, "token_verifier", hs256_verifier())
+    monkeypatch.setattr(settings, "AUTH_REMOTE_FALLBACK", True)
+
+    with pytest.raises(HTTPException) as error:
+        authenticate(jwt.encode(claims(exp=int(time.time()) - 10), SECRET, algorithm="HS256"))
+    assert error.value.status_code == 401
+    assert remote_users == []
+
+def test_valid_token_is_verified_locally(monkeypatch, remote_users):
+    monkeypatch.setattr(deps, "token_verifier", hs256_verifier())
+    assert authenticate(jwt.encode(claims(), SECRET, algorithm="HS256")).id == "user-1"
+    assert remote_users == []
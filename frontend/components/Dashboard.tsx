@@ -31,7 +31,7 @@ export default function Dashboard({ user }: { user: User }) {
         fetchApi('/users/me').catch(() => null)
       ])
       
-      setGroups(groupsData)
+      setGroups(groupsData.items)
       if (userData?.wallet_address) {
         setWalletAddress(userData.wallet_address)
       }
@@ -2,6 +2,7 @@
 
 import { useEffect, useState } from 'react'
 import { fetchApi } from '@/lib/api'
+import { formatCents, splitEvenly, toCents } from '@/lib/money'
 import { User } from '@supabase/supabase-js'
 import { ArrowLeft, Plus, Receipt, Users, Wallet, UserPlus, ArrowRightLeft } from 'lucide-react'
 
@@ -35,6 +36,12 @@ interface GroupDetails {
   name: string
   members: GroupMember[]
   expenses: Expense[]
+  expenses_next_cursor: string | null
+}
+
+interface ExpensePage {
+  items: Expense[]
+  next_cursor: string | null
 }
 
 interface GroupDetailsProps {
@@ -47,6 +54,7 @@ export default function GroupDetails({ groupId, currentUser, onBack }: GroupDeta
   const [group, setGroup] = useState<GroupDetails | null>(null)
   const [balances, setBalances] = useState<Balance[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [showAddExpense, setShowAddExpense] = useState(false)
   const [showInvite, setShowInvite] = useState(false)
   const [inviteEmail, setInviteEmail] = useState('')
@@ -70,6 +78,26 @@ export default function GroupDetails({ groupId, currentUser, onBack }: GroupDeta
     }
   }
 
+  // Older expenses, a page at a time after the ones embedded in the group
+  const loadMoreExpenses = async () => {
+    if (!group?.expenses_next_cursor) return
+    setLoadingMore(true)
+    try {
+      const page: ExpensePage = await fetchApi(
+        `/groups/${groupId}/expenses?cursor=${encodeURIComponent(group.expenses_next_cursor)}`
+      )
+      setGroup(current => current && {
+        ...current,
+        expenses: [...current.expenses, ...page.items],
+        expenses_next_cursor: page.next_cursor
+      })
+    } catch (error) {
+      console.error('Failed to load more expenses:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const loadBalances = async () => {
     try {
       const data = await fetchApi(`/groups/${groupId}/balances`)
@@ -98,14 +126,21 @@ export default function GroupDetails({ groupId, currentUser, onBack }: GroupDeta
     e.preventDefault()
     if (!group) return
 
-    const totalAmount = parseFloat(amount)
-    if (isNaN(totalAmount) || totalAmount <= 0) return
+    const totalCents = toCents(amount)
+    if (totalCents === null || totalCents <= 0) {
+      alert('Enter an amount with at most two decimals.')
+      return
+    }
 
-    // Simple equal split for now
-    const splitAmount = totalAmount / group.members.length
-    const splits = group.members.map(member => ({
+    // Equal split in whole cents, the leftover cents go to the first members
+    const shares = splitEvenly(totalCents, group.members.length)
+    if (shares.reduce((sum, share) => sum + share, 0) !== totalCents) {
+      alert('Could not split the amount evenly.')
+      return
+    }
+    const splits = group.members.map((member, i) => ({
       user_id: member.id,
-      amount: splitAmount
+      amount: formatCents(shares[i])
     }))
 
     const payer = group.members.find(m => m.email === currentUser.email)
@@ -120,7 +155,7 @@ export default function GroupDetails({ groupId, currentUser, onBack }: GroupDeta
         body: JSON.stringify({
           group_id: group.id,
           paid_by_id: payer.id,
-          amount: totalAmount,
+          amount: formatCents(totalCents),
           splits: splits
         })
       })
@@ -298,6 +333,15 @@ export default function GroupDetails({ groupId, currentUser, onBack }: GroupDeta
                     </div>
                   </div>
                 ))}
+                {group.expenses_next_cursor && (
+                  <button
+                    onClick={loadMoreExpenses}
+                    disabled={loadingMore}
+                    className="w-full py-3 rounded-xl bg-white/5 border border-white/10 text-sm text-gray-400 hover:text-white hover:bg-white/10 transition-colors disabled:opacity-50"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </div>
             )}
           </div>
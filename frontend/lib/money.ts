@@ -0,0 +1,23 @@
+// Amounts are handled as integer cents and sent to the API as two-decimal
+// strings, like the backend does (app/core/money.py). A float share such as
+// 10 / 3 cannot be represented and is rejected by the API.
+
+export function toCents(value: string): number | null {
+  const match = /^\s*(\d+)(?:\.(\d{0,2}))?\s*$/.exec(value)
+  if (!match) return null
+  return Number(match[1]) * 100 + Number((match[2] ?? '').padEnd(2, '0'))
+}
+
+export function formatCents(cents: number): string {
+  const sign = cents < 0 ? '-' : ''
+  const abs = Math.abs(cents)
+  return `${sign}${Math.floor(abs / 100)}.${String(abs % 100).padStart(2, '0')}`
+}
+
+// `cents` in `count` parts that differ by at most one cent, the leftover
+// cents going to the first parts: 1000 / 3 -> 334, 333, 333 (split_evenly)
+export function splitEvenly(cents: number, count: number): number[] {
+  const share = Math.floor(cents / count)
+  const leftover = cents - share * count
+  return Array.from({ length: count }, (_, i) => share + (i < leftover ? 1 : 0))
+}